@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
@@ -10,15 +10,24 @@ import logging
 from datetime import datetime
 import json
 import io
+import threading
 
 # Add paths for your modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'model'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'geospatial'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import your existing modules
 from model.model_utils.load_predict import router as model_router
 from geospatial.geofencing.fence_utils import check_zone_violation
-from geospatial.zone_violation_detector.detect_violation import detect_illegal_behavior as detect_violations
+from geospatial.zone_violation_detector.detect_violation import detect_illegal_behavior as detect_violations, ZONE_FLAGS
+from geospatial.ingest_reduction.reduce_ais import reduce_ais
+from geospatial.geofencing.tiles import zone_tile_cache
+from model.anomaly_detection.online_scorer import OnlineAnomalyScorer, get_anomaly_scorer, ANOMALY_STATE_PATH
+from model.model_utils.ais_fields import resolve_columns
+from model.time_series.trajectory_forecast import TrajectoryForecaster, latest_track_state
+from risk_engine import get_risk_engine, flatten_analysis, fleet_results_frame
+from profiling import ProfilingMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +48,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (PROFILE_TOKEN / PROFILE_SAMPLE_EVERY); a no-op otherwise
+app.add_middleware(ProfilingMiddleware)
+
 # Pydantic models for request/response
 class VesselData(BaseModel):
     vessel_id: str
@@ -66,6 +78,8 @@ class ZoneCheckResponse(BaseModel):
     is_violation: bool
     zone_name: Optional[str]
 
+trajectory_forecaster = TrajectoryForecaster()
+
 class VesselAnalysisResponse(BaseModel):
     vessel_id: str
     analysis_results: Dict[str, Any]
@@ -75,6 +89,29 @@ class VesselAnalysisResponse(BaseModel):
 # Include your existing model router
 app.include_router(model_router, prefix="/api/model", tags=["model"])
 
+@app.on_event("shutdown")
+def save_anomaly_baselines():
+    # Persist per-vessel baselines so a restart doesn't reset them
+    try:
+        get_anomaly_scorer().save(ANOMALY_STATE_PATH)
+    except Exception as e:
+        logger.error(f"Failed to save anomaly baselines: {str(e)}")
+
+@app.on_event("startup")
+def pregenerate_zone_tiles():
+    # Warm the low-zoom zone tiles in the background so first map views are cache hits
+    max_zoom = int(os.environ.get("TILE_PREGENERATE_MAX_ZOOM", "4"))
+    
+    def run():
+        try:
+            count = zone_tile_cache.pregenerate(max_zoom=max_zoom)
+            logger.info(f"Pre-generated {count} zone tiles up to zoom {max_zoom}")
+        except Exception as e:
+            logger.warning(f"Zone tile pre-generation skipped: {str(e)}")
+    
+    if max_zoom >= 0:
+        threading.Thread(target=run, name="tile-pregenerate", daemon=True).start()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -102,7 +139,7 @@ async def predict_vessel(vessel_data: VesselData):
         
         # Call your existing model prediction logic
         # This should connect to your model/model_utils/load_predict.py
-        predictions = await call_model_prediction(input_data)
+        predictions = await call_model_prediction(input_data, update_baseline=vessel_data.timestamp is not None)
         
         response = PredictionResponse(
             vessel_id=vessel_data.vessel_id,
@@ -147,6 +184,27 @@ async def check_zone(coordinate_data: CoordinateData):
         logger.error(f"Zone check error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Zone check failed: {str(e)}")
 
+# Zone vector tiles for the map frontend
+@app.get("/tiles/{layer}/{z}/{x}/{y}")
+def get_zone_tile(layer: str, z: int, x: int, y: int, request: Request):
+    """
+    Serve clipped, zoom-simplified MPA/EEZ/port geometry as a GeoJSON tile
+    """
+    try:
+        body, etag = zone_tile_cache.get_tile(layer, z, x, y)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Tile error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Tile generation failed: {str(e)}")
+    
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/geo+json", headers=headers)
+
 # Vessel analysis endpoint
 @app.post("/api/analyze-vessel/", response_model=VesselAnalysisResponse)
 async def analyze_vessel(vessel_data: VesselData):
@@ -164,10 +222,11 @@ async def analyze_vessel(vessel_data: VesselData):
             'speed': vessel_data.speed,
             'course': vessel_data.course,
             'vessel_type': vessel_data.vessel_type,
+            'timestamp': vessel_data.timestamp or datetime.now().isoformat()
         }
         
         # Get ML predictions
-        predictions = await call_model_prediction(input_data)
+        predictions = await call_model_prediction(input_data, update_baseline=vessel_data.timestamp is not None)
         
         # Check zone violations
         zone_result = check_zone_violation(
@@ -176,21 +235,21 @@ async def analyze_vessel(vessel_data: VesselData):
         )
         
         # Detect violations using your existing logic
-        violations = detect_violations(input_data)
+        violations = detect_violations(pd.DataFrame([input_data]))
         
-        # Combine results
+        # Combine results; the response carries plain JSON records of the flags
         analysis_results = {
             'predictions': predictions,
             'zone_check': zone_result,
-            'violations': violations,
+            'violations': json.loads(violations[ZONE_FLAGS].to_json(orient='records')),
             'anomaly_score': predictions.get('anomaly_score', 0.0)
         }
         
         # Calculate risk score
-        risk_score = calculate_risk_score(analysis_results)
+        risk_score = calculate_risk_score(analysis_results, violations)
         
         # Generate recommendations
-        recommendations = generate_recommendations(analysis_results)
+        recommendations = generate_recommendations(analysis_results, violations)
         
         response = VesselAnalysisResponse(
             vessel_id=vessel_data.vessel_id,
@@ -240,13 +299,40 @@ async def upload_ais_data(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
 
 # Helper functions to connect to your existing code
-async def call_model_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
+async def call_model_prediction(input_data: Dict[str, Any], update_baseline: bool = True) -> Dict[str, Any]:
     """
     Connect to your existing model prediction logic
+    
+    The streaming anomaly baseline absorbs each (vessel, timestamp) once, so calling
+    /api/predict/ and /api/analyze-vessel/ for the same ping doesn't count it twice.
+    Pings without a client timestamp can't be told apart and are scored read-only.
     """
     # This should call your model/model_utils/load_predict.py functions
     # Adapt this to match your existing model interface
     
+    # Turn rate against the vessel's previous ping, read before this ping is absorbed
+    scorer = get_anomaly_scorer()
+    turn_rate = scorer.turn_rate(input_data['vessel_id'], input_data.get('timestamp'), input_data.get('course'))
+    
+    # Streaming anomaly score, updated with this ping in O(1)
+    anomaly_score = scorer.score_ping(
+        input_data['vessel_id'],
+        timestamp=input_data.get('timestamp'),
+        speed=input_data.get('speed'),
+        course=input_data.get('course'),
+        heading=input_data.get('heading'),
+        update=update_baseline
+    )
+    
+    # Short-horizon kinematic forecast from the current ping
+    trajectory = trajectory_forecaster.forecast_single(
+        input_data['latitude'],
+        input_data['longitude'],
+        input_data.get('speed') or 0.0,
+        input_data.get('course') or 0.0,
+        turn_rate
+    )
+    
     try:
         # Example structure - adapt to your actual model calls
         from model.model_utils.load_predict import predict_vessel_behavior
@@ -255,56 +341,31 @@ async def call_model_prediction(input_data: Dict[str, Any]) -> Dict[str, Any]:
         
         return {
             'vessel_type_prediction': predictions.get('vessel_type'),
-            'anomaly_score': predictions.get('anomaly_score', 0.0),
+            'anomaly_score': predictions.get('anomaly_score', anomaly_score),
             'fishing_probability': predictions.get('fishing_prob', 0.0),
             'confidence': predictions.get('confidence', 0.0),
-            'trajectory_prediction': predictions.get('trajectory')
+            'trajectory_prediction': predictions.get('trajectory') or trajectory
         }
         
     except Exception as e:
         logger.error(f"Model prediction error: {str(e)}")
-        return {'error': str(e)}
+        return {'error': str(e), 'anomaly_score': anomaly_score, 'trajectory_prediction': trajectory}
 
-def calculate_risk_score(analysis_results: Dict[str, Any]) -> float:
+def calculate_risk_score(analysis_results: Dict[str, Any], violations: Optional[pd.DataFrame] = None) -> float:
     """
     Calculate overall risk score based on analysis results
     """
-    risk_factors = []
-    
-    # Add risk from anomaly detection
-    anomaly_score = analysis_results.get('predictions', {}).get('anomaly_score', 0.0)
-    risk_factors.append(anomaly_score * 0.4)
-    
-    # Add risk from zone violations
-    if analysis_results.get('zone_check', {}).get('is_violation'):
-        risk_factors.append(0.3)
-    
-    # Add risk from speed/course anomalies
-    violations = analysis_results.get('violations', [])
-    if violations:
-        risk_factors.append(len(violations) * 0.1)
-    
-    return min(sum(risk_factors), 1.0)
+    # Same rule engine as the fleet path in process_ais_data
+    scored = get_risk_engine().score_frame(flatten_analysis(analysis_results, violations))
+    return float(scored['risk_score'].iloc[0])
 
-def generate_recommendations(analysis_results: Dict[str, Any]) -> List[str]:
+def generate_recommendations(analysis_results: Dict[str, Any], violations: Optional[pd.DataFrame] = None) -> List[str]:
     """
     Generate recommendations based on analysis results
     """
-    recommendations = []
-    
-    if analysis_results.get('zone_check', {}).get('is_violation'):
-        recommendations.append("Vessel is in restricted zone - immediate attention required")
-    
-    if analysis_results.get('predictions', {}).get('anomaly_score', 0) > 0.7:
-        recommendations.append("Vessel showing anomalous behavior - monitor closely")
-    
-    if analysis_results.get('predictions', {}).get('fishing_probability', 0) > 0.8:
-        recommendations.append("High probability of fishing activity - verify permits")
-    
-    if not recommendations:
-        recommendations.append("No immediate action required - continue monitoring")
-    
-    return recommendations
+    engine = get_risk_engine()
+    scored = engine.score_frame(flatten_analysis(analysis_results, violations))
+    return engine.decode_messages(int(scored['recommendation_codes'].iloc[0]))
 
 def process_ais_data(df: pd.DataFrame) -> Dict[str, Any]:
     """
@@ -324,6 +385,64 @@ def process_ais_data(df: pd.DataFrame) -> Dict[str, Any]:
             'summary': 'AIS data processed successfully'
         }
         
+        # Report thresholds come from the risk rule file
+        engine = get_risk_engine()
+        
+        # Streaming anomaly scores for every ping, then risk in one vectorized pass.
+        # Uploads are historical files, so they get their own baselines and never
+        # shift the live per-vessel state used by /api/predict/.
+        if 'anomaly_score' not in df.columns:
+            df = df.assign(anomaly_score=OnlineAnomalyScorer().score_frame(df))
+        results['anomalous_records'] = int((df['anomaly_score'] > engine.anomaly_threshold).sum())
+        
+        # Forecast every vessel's latest state and flag predicted zone entries in one pass
+        try:
+            entries = trajectory_forecaster.predict_zone_entries(latest_track_state(df))
+            results['predicted_zone_entries'] = entries.to_dict(orient='records')
+        except Exception as e:
+            logger.warning(f"Zone entry forecast skipped: {str(e)}")
+        
+        # Zone flags for every uploaded ping, computed once and shared by the risk
+        # statistics, the violation summary and the reduced tracks below
+        cols = resolve_columns(df)
+        has_position = bool(cols['latitude'] and cols['longitude'])
+        if has_position:
+            df = detect_violations(df, lon_col=cols['longitude'], lat_col=cols['latitude'])
+            results['violations'] = {
+                'pings': len(df),
+                **{flag: int(df[flag].sum()) for flag in ZONE_FLAGS}
+            }
+        
+        # Risk statistics are per uploaded record, before any reduction
+        scored = engine.score_frame(fleet_results_frame(df))
+        results['risk'] = {
+            'mean_score': float(scored['risk_score'].mean()) if len(scored) else 0.0,
+            'max_score': float(scored['risk_score'].max()) if len(scored) else 0.0,
+            'high_risk_records': int((scored['risk_score'] >= engine.high_risk_threshold).sum()),
+            'recommendations': engine.summarize(scored)
+        }
+        
+        # Reduced tracks of the flagged pings: duplicates dropped, dwells collapsed and
+        # tracks simplified without merging across behavior or zone changes; anomalous
+        # pings are kept. Counts here are track records, not pings.
+        if has_position and cols['vessel_id']:
+            tracks, stats = reduce_ais(
+                df,
+                id_col=cols['vessel_id'],
+                time_col=cols['timestamp'] or 'timestamp',
+                lat_col=cols['latitude'],
+                lon_col=cols['longitude'],
+                speed_col=cols['sog'] or 'speed',
+                break_on=['behavior', *ZONE_FLAGS],
+                must_keep=(df['anomaly_score'] > engine.anomaly_threshold).to_numpy()
+            )
+            results['reduction'] = stats
+            results['track_records'] = {
+                'records': len(tracks),
+                **{flag: int(tracks[flag].sum()) for flag in ZONE_FLAGS},
+                'dwell_records': int((tracks['dwell_pings'] > 1).sum())
+            }
+        
         return results
         
     except Exception as e:
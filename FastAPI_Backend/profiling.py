@@ -0,0 +1,233 @@
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import count
+from typing import Dict, List, Optional
+
+import anyio
+
+# Innermost frames from these modules mean the thread is idle, not working for the request
+IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+# What a profile covers, sent as X-Profile-Scope
+PROFILE_SCOPE = b"process"
+
+
+class StackSampler:
+    """
+    Samples Python stacks on a background thread: the given threads plus, with
+    include_workers, every AnyIO worker thread. A worker cannot be tied to one
+    request from outside it, so worker stacks include whatever else is running
+    there concurrently; each stack is rooted at its thread name.
+    """
+
+    def __init__(self, thread_ids: List[int], interval: float = 0.005, include_workers: bool = True):
+        self.thread_ids = set(thread_ids)
+        self.interval = interval
+        self.include_workers = include_workers
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started = self.stopped = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            threads = threading.enumerate()
+            names = {t.ident: t.name for t in threads}
+            targets = set(self.thread_ids)
+            if self.include_workers:
+                # Sync endpoints run on AnyIO worker threads, which may start mid-request
+                targets.update(t.ident for t in threads if t.name.startswith("AnyIO worker"))
+            frames = sys._current_frames()
+            for thread_id in targets:
+                frame = frames.get(thread_id)
+                if frame is None or os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[tuple(reversed(stack))] += 1
+
+    def to_collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format (flamegraph.pl, speedscope, inferno)"""
+        return "\n".join(f"{';'.join(stack)} {n}" for stack, n in self.samples.most_common()) + "\n"
+
+    def to_speedscope(self, name: str) -> str:
+        """Speedscope 'sampled' profile JSON"""
+        frame_index: Dict[str, int] = {}
+        samples, weights = [], []
+        for stack, n in self.samples.items():
+            samples.append([frame_index.setdefault(f, len(frame_index)) for f in stack])
+            weights.append(n * self.interval)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "maritime-surveillance-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": f} for f in frame_index]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.stopped - self.started,
+                "samples": samples,
+                "weights": weights,
+            }],
+        })
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in sampling profiler for individual requests (pure ASGI, so a request that
+    is not profiled costs one counter bump and a header lookup).
+
+    - On demand: send `X-Profile: <PROFILE_TOKEN>`. The token is only read from the
+      header, never the query string, so it stays out of access logs and URLs.
+      The profile is saved under PROFILE_DIR and named in the `X-Profile-File`
+      response header; add `X-Profile-Return: 1` to get the profile back as the
+      response body instead. `X-Profile-Format` selects `collapsed` (default) or
+      `speedscope`.
+    - Continuous: with PROFILE_SAMPLE_EVERY=N, every Nth request is profiled and
+      kept only if it took at least PROFILE_SLOW_MS; the newest
+      PROFILE_RING_SIZE profiles are kept in PROFILE_DIR/slow.
+
+    A profile covers the request's time window, not only its own work: the event
+    loop and all AnyIO worker threads are sampled, so requests running
+    concurrently show up too (`X-Profile-Scope: process`). Profile on a quiet
+    instance when a clean per-request picture matters.
+    """
+
+    def __init__(self, app, token: Optional[str] = None, sample_every: Optional[int] = None,
+                 slow_ms: Optional[float] = None, ring_size: Optional[int] = None,
+                 output_dir: Optional[str] = None, interval: float = 0.005):
+        self.app = app
+        self.token = token if token is not None else os.environ.get("PROFILE_TOKEN", "")
+        self.sample_every = sample_every if sample_every is not None else int(os.environ.get("PROFILE_SAMPLE_EVERY", "0"))
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.environ.get("PROFILE_SLOW_MS", "500"))
+        self.ring_size = ring_size if ring_size is not None else int(os.environ.get("PROFILE_RING_SIZE", "50"))
+        self.output_dir = output_dir or os.environ.get(
+            "PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+        )
+        self.interval = interval
+        self._requests = count(1)
+        self._ring_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        options = self._on_demand_options(scope) if self.token else None
+        sampled = options is None and self.sample_every > 0 and next(self._requests) % self.sample_every == 0
+        if options is None and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        await self._profile(scope, receive, send, options or {"format": "collapsed", "return": False}, sampled)
+
+    def _on_demand_options(self, scope) -> Optional[Dict[str, object]]:
+        raw_headers = scope.get("headers", [])
+        if not any(k == b"x-profile" for k, _ in raw_headers):
+            return None
+        # latin-1 round-trips any byte, so the token is compared on the raw bytes sent
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in raw_headers}
+        supplied = headers.get("x-profile", "")
+        if not supplied or not hmac.compare_digest(supplied.encode("latin-1"), self.token.encode("utf-8")):
+            return None
+        fmt = headers.get("x-profile-format", "collapsed")
+        ret = headers.get("x-profile-return", "0")
+        return {
+            "format": "speedscope" if fmt == "speedscope" else "collapsed",
+            "return": ret in ("1", "true", "yes"),
+        }
+
+    async def _profile(self, scope, receive, send, options, sampled: bool):
+        fmt = options["format"]
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        route = scope.get("path", "").strip("/").replace("/", "_") or "root"
+        filename = f"{stamp}_{route}.{'speedscope.json' if fmt == 'speedscope' else 'collapsed.txt'}"
+
+        # The event loop thread plus every worker thread sync endpoints run on (process-wide)
+        sampler = StackSampler([threading.get_ident()], self.interval)
+        captured: Dict[str, object] = {}
+
+        async def send_wrapper(message):
+            if options["return"]:
+                # Swallow the real response; the profile is sent instead
+                if message["type"] == "http.response.start":
+                    captured["status"] = message["status"]
+                return
+            if message["type"] == "http.response.start" and not sampled:
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", filename.encode("latin-1")),
+                    (b"x-profile-scope", PROFILE_SCOPE),
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        name = f"{scope.get('method', '')} {scope.get('path', '')} ({elapsed_ms:.1f} ms, whole process)"
+        body = sampler.to_speedscope(name) if fmt == "speedscope" else sampler.to_collapsed()
+
+        if options["return"]:
+            content_type = b"application/json" if fmt == "speedscope" else b"text/plain; charset=utf-8"
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", content_type),
+                    (b"x-profiled-status", str(captured.get("status", "")).encode("latin-1")),
+                    (b"x-profile-elapsed-ms", f"{elapsed_ms:.1f}".encode("latin-1")),
+                    (b"x-profile-scope", PROFILE_SCOPE),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body.encode("utf-8")})
+        elif sampled:
+            # File writes (and ring pruning) run on a worker thread, off the event loop
+            if elapsed_ms >= self.slow_ms:
+                await anyio.to_thread.run_sync(self._save_to_ring, filename, body)
+        else:
+            await anyio.to_thread.run_sync(self._save, os.path.join(self.output_dir, filename), body)
+
+    @staticmethod
+    def _save(path: str, body: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(body)
+
+    def _save_to_ring(self, filename: str, body: str):
+        """Keep only the newest ring_size slow-request profiles on disk"""
+        ring_dir = os.path.join(self.output_dir, "slow")
+        with self._ring_lock:
+            self._save(os.path.join(ring_dir, filename), body)
+            existing = sorted(os.listdir(ring_dir))
+            for old in existing[:max(len(existing) - self.ring_size, 0)]:
+                try:
+                    os.remove(os.path.join(ring_dir, old))
+                except OSError:
+                    pass
@@ -0,0 +1,212 @@
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Default rule file shipped next to the backend; override with RISK_RULES_PATH
+DEFAULT_RULES_PATH = os.environ.get(
+    "RISK_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_rules.json")
+)
+
+# Fill values used when a scored column is missing from the results frame
+COLUMN_DEFAULTS = {
+    "anomaly_score": 0.0,
+    "is_violation": False,
+    "violation_count": 0,
+    "fishing_probability": 0.0,
+    "zone_distance_km": np.inf,
+}
+
+COMPARISON_OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def _column(df: pd.DataFrame, name: str, default: Any = None) -> np.ndarray:
+    """Return a column as a float array, filling missing columns/values with the default"""
+    if default is None:
+        default = COLUMN_DEFAULTS.get(name, 0.0)
+    if name not in df.columns:
+        return np.full(len(df), float(default))
+    values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isnan(values), float(default), values)
+
+
+def _compile_score_rule(rule: Dict[str, Any]) -> Callable[[pd.DataFrame], np.ndarray]:
+    """Turn one score rule from the config into a vectorized column expression"""
+    column = rule["column"]
+    weight = float(rule.get("weight", 0.0))
+    rule_type = rule.get("type", "linear")
+    default = rule.get("default")
+
+    if rule_type == "linear":
+        return lambda df: _column(df, column, default) * weight
+    if rule_type == "flag":
+        return lambda df: (_column(df, column, default) != 0) * weight
+    if rule_type == "threshold":
+        threshold = float(rule["threshold"])
+        return lambda df: (_column(df, column, default) > threshold) * weight
+    if rule_type == "proximity":
+        # Full weight at distance 0, fading linearly to nothing at radius_km
+        radius = float(rule["radius_km"])
+        return lambda df: np.clip(1.0 - _column(df, column, default) / radius, 0.0, 1.0) * weight
+
+    raise ValueError(f"Unknown score rule type '{rule_type}' for rule '{rule.get('name', column)}'")
+
+
+def _compile_recommendation_rule(rule: Dict[str, Any]) -> Callable[[pd.DataFrame], np.ndarray]:
+    """Turn one recommendation rule from the config into a vectorized boolean mask"""
+    column = rule["column"]
+    op = COMPARISON_OPS.get(rule.get("op", ">"))
+    if op is None:
+        raise ValueError(f"Unknown comparison '{rule.get('op')}' for recommendation '{rule['code']}'")
+    value = float(rule["value"])
+    default = rule.get("default")
+    return lambda df: op(_column(df, column, default), value)
+
+
+class RiskEngine:
+    """Config-driven risk scoring over a results DataFrame (one row per vessel-ping)"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.max_score = float(config.get("max_score", 1.0))
+        thresholds = config.get("thresholds", {})
+        # Cut-offs for counting anomalous pings and high-risk records in reports
+        self.anomaly_threshold = float(thresholds.get("anomaly_score", 0.7))
+        self.high_risk_threshold = float(thresholds.get("high_risk_score", 0.7))
+        self.score_rules = [
+            (rule.get("name", rule["column"]), _compile_score_rule(rule))
+            for rule in config.get("score_rules", [])
+        ]
+
+        recommendation_rules = config.get("recommendation_rules", [])
+        if len(recommendation_rules) > 63:
+            raise ValueError("At most 63 recommendation rules are supported")
+        self.recommendation_rules = [
+            (rule["code"], rule["message"], _compile_recommendation_rule(rule))
+            for rule in recommendation_rules
+        ]
+        default = config.get("default_recommendation", {})
+        self.default_code = default.get("code", "CONTINUE_MONITORING")
+        self.default_message = default.get("message", "No immediate action required - continue monitoring")
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULES_PATH) -> "RiskEngine":
+        """Build an engine from a JSON rule file"""
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def score_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Score every row of a results frame in one pass.
+
+        Parameters:
+        - df: DataFrame with any of the columns referenced by the rules
+              (anomaly_score, is_violation, violation_count, fishing_probability,
+              zone_distance_km). Missing columns fall back to neutral defaults.
+
+        Returns:
+        - DataFrame indexed like df with columns:
+            - risk_score (float, clipped to [0, max_score])
+            - recommendation_codes (int64 bitmask, bit i = recommendation rule i fired)
+        """
+        score = np.zeros(len(df), dtype=float)
+        for _, rule in self.score_rules:
+            score += rule(df)
+        np.clip(score, 0.0, self.max_score, out=score)
+
+        codes = np.zeros(len(df), dtype=np.int64)
+        for bit, (_, _, rule) in enumerate(self.recommendation_rules):
+            codes |= rule(df).astype(np.int64) << bit
+
+        return pd.DataFrame({"risk_score": score, "recommendation_codes": codes}, index=df.index)
+
+    def decode_codes(self, codes: int) -> List[str]:
+        """Return the recommendation code names set in a bitmask"""
+        names = [code for bit, (code, _, _) in enumerate(self.recommendation_rules) if codes >> bit & 1]
+        return names or [self.default_code]
+
+    def decode_messages(self, codes: int) -> List[str]:
+        """Return the human-readable recommendations set in a bitmask"""
+        messages = [msg for bit, (_, msg, _) in enumerate(self.recommendation_rules) if codes >> bit & 1]
+        return messages or [self.default_message]
+
+    def summarize(self, scored: pd.DataFrame) -> Dict[str, int]:
+        """Count how many rows triggered each recommendation code"""
+        codes = scored["recommendation_codes"].to_numpy()
+        summary = {
+            code: int(np.count_nonzero(codes >> bit & 1))
+            for bit, (code, _, _) in enumerate(self.recommendation_rules)
+        }
+        summary[self.default_code] = int(np.count_nonzero(codes == 0))
+        return summary
+
+
+def fleet_results_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-record results frame for a fleet upload, built like flatten_analysis does for
+    a single vessel. Zone columns come from the per-ping flags added by
+    detect_illegal_behavior (in_mpa, in_eez, near_port, illegal_fishing); without
+    them the zone rules fall back to their defaults.
+    """
+    results = pd.DataFrame({"anomaly_score": df["anomaly_score"]}, index=df.index)
+
+    if "in_mpa" in df.columns:
+        results["is_violation"] = df["in_mpa"] | df["in_eez"] | df["near_port"]
+        results["violation_count"] = df["illegal_fishing"].astype(int)
+
+    for col in ("fishing_probability", "zone_distance_km"):
+        if col in df.columns:
+            results[col] = df[col]
+
+    return results
+
+
+def flatten_analysis(analysis_results: Dict[str, Any],
+                     violations: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Turn the nested single-vessel analysis dict into a one-row results frame.
+    A violations frame from detect_illegal_behavior, when given, takes precedence
+    over analysis_results['violations'] (which may be its serialized form).
+    """
+    predictions = analysis_results.get("predictions", {}) or {}
+    zone_check = analysis_results.get("zone_check", {}) or {}
+    if violations is None:
+        violations = analysis_results.get("violations")
+    if isinstance(violations, list) and violations and isinstance(violations[0], dict):
+        violations = pd.DataFrame(violations)
+
+    if isinstance(violations, pd.DataFrame):
+        violation_count = int(violations["illegal_fishing"].sum()) if "illegal_fishing" in violations.columns else 0
+    elif violations:
+        violation_count = len(violations)
+    else:
+        violation_count = 0
+
+    return pd.DataFrame([{
+        "anomaly_score": predictions.get("anomaly_score", 0.0),
+        "is_violation": bool(zone_check.get("is_violation", False)),
+        "violation_count": violation_count,
+        "fishing_probability": predictions.get("fishing_probability", 0.0),
+        "zone_distance_km": zone_check.get("distance_km", np.inf),
+    }])
+
+
+_engine: Optional[RiskEngine] = None
+
+
+def get_risk_engine() -> RiskEngine:
+    """Return the process-wide engine, loading the rule file on first use"""
+    global _engine
+    if _engine is None:
+        _engine = RiskEngine.from_file()
+    return _engine
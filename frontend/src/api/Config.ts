@@ -9,6 +9,7 @@ export const API_ENDPOINTS = {
   AGENTS_INFO: `${API_BASE_URL}/api/agents/info/`,
   ZONES_STATUS: `${API_BASE_URL}/api/zones/status/`,
   BATCH_ANALYZE: `${API_BASE_URL}/api/batch-analyze/`,
+  ZONE_TILES: `${API_BASE_URL}/tiles/{layer}/{z}/{x}/{y}`,
 };
 
 export const API_CONFIG = {
@@ -1,6 +1,9 @@
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 from shapely.geometry import Point
+from functools import lru_cache
 import os
 
 def load_zone_shapefiles():
@@ -20,6 +23,42 @@ def load_zone_shapefiles():
         "ports": gpd.read_file(get_shp_path("ports")).to_crs(epsg=4326),
     }
 
+@lru_cache(maxsize=1)
+def load_zone_index():
+    """
+    Loads the zone shapefiles once and returns one prepared, unioned geometry per zone type.
+
+    Returns:
+    - dict: zone type ('mpa', 'eez', 'ports') -> prepared shapely geometry, ready for
+            repeated vectorized point-in-zone queries.
+    """
+    index = {}
+    for zone_type, zone_gdf in load_zone_shapefiles().items():
+        geometry = zone_gdf.unary_union
+        shapely.prepare(geometry)
+        index[zone_type] = geometry
+    return index
+
+def points_in_zones(longitudes, latitudes, zone_types=None):
+    """
+    Tests many points against the cached zone index in one vectorized call per zone.
+
+    Parameters:
+    - longitudes: Array-like of longitudes (any shape).
+    - latitudes: Array-like of latitudes, same shape as longitudes.
+    - zone_types: Optional list of zone types to test (default: all).
+
+    Returns:
+    - dict: zone type -> boolean array with the same shape as the inputs.
+    """
+    index = load_zone_index()
+    lons = np.asarray(longitudes, dtype=float)
+    lats = np.asarray(latitudes, dtype=float)
+    return {
+        zone_type: shapely.contains_xy(index[zone_type], lons, lats)
+        for zone_type in (zone_types or index.keys())
+    }
+
 def assign_zone(df, zone_gdf, column_name, lon_col="LON", lat_col="LAT"):
     """
     Assigns True/False if each point falls within a given zone.
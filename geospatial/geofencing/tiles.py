@@ -0,0 +1,152 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from shapely.geometry import box, mapping
+
+from geospatial.geofencing.fence_utils import load_zone_shapefiles
+
+TILE_LAYERS = ("mpa", "eez", "ports")
+TILE_SIZE_PX = 256
+MAX_ZOOM = 14
+
+# Attribute columns tried, in order, for a feature's display name
+NAME_COLUMNS = ("name", "NAME", "GEONAME", "PORT_NAME", "NAME_EN")
+
+
+def tile_bounds(z, x, y):
+    """
+    Returns the (west, south, east, north) lon/lat bounds of an XYZ (slippy map) tile.
+    """
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def pixel_degrees(z):
+    """Width of one tile pixel in degrees of longitude at zoom z"""
+    return 360.0 / (TILE_SIZE_PX * 2 ** z)
+
+
+@lru_cache(maxsize=1)
+def _load_layers():
+    """Reads each zone layer once and keeps geometries plus a display name per feature"""
+    layers = {}
+    for layer, gdf in load_zone_shapefiles().items():
+        name_col = next((c for c in NAME_COLUMNS if c in gdf.columns), None)
+        names = gdf[name_col].astype(str).to_numpy() if name_col else np.full(len(gdf), None)
+        layers[layer] = (gdf.geometry.to_numpy(), names)
+    return layers
+
+
+class ZoneTileCache:
+    """
+    Serves MPA/EEZ/port zones as compact GeoJSON tiles.
+
+    Each layer is simplified once per zoom level (tolerance of half a pixel) and
+    indexed with an STRtree; a tile then only clips the few candidate geometries
+    it touches and quantizes coordinates to the pixel grid. Encoded tiles are
+    kept in a bounded LRU with a content hash as ETag, so repeat requests while
+    panning are a dictionary lookup (or a 304).
+    """
+
+    def __init__(self, max_tiles=4096, buffer_px=8):
+        self.max_tiles = max_tiles
+        self.buffer_px = buffer_px
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    @lru_cache(maxsize=len(TILE_LAYERS) * (MAX_ZOOM + 1))
+    def _layer_at_zoom(self, layer, z):
+        geometries, names = _load_layers()[layer]
+        simplified = shapely.simplify(geometries, pixel_degrees(z) / 2, preserve_topology=True)
+        keep = ~shapely.is_empty(simplified)
+        simplified, names = simplified[keep], names[keep]
+        return shapely.STRtree(simplified), simplified, names
+
+    def _render(self, layer, z, x, y):
+        tree, geometries, names = self._layer_at_zoom(layer, z)
+        west, south, east, north = tile_bounds(z, x, y)
+        pad = pixel_degrees(z) * self.buffer_px
+        clip_box = box(west - pad, south - pad, east + pad, north + pad)
+
+        # ~1/4 pixel precision is invisible on screen and keeps the JSON small
+        decimals = min(max(int(math.ceil(-math.log10(pixel_degrees(z) / 4))), 0), 7)
+
+        features = []
+        for i in tree.query(clip_box, predicate="intersects"):
+            clipped = shapely.clip_by_rect(geometries[i], *clip_box.bounds)
+            if clipped.is_empty:
+                continue
+            clipped = shapely.transform(clipped, lambda coords: np.round(coords, decimals))
+            features.append({
+                "type": "Feature",
+                "geometry": mapping(clipped),
+                "properties": {"layer": layer, "name": names[i]},
+            })
+
+        return json.dumps({"type": "FeatureCollection", "features": features},
+                          separators=(",", ":")).encode("utf-8")
+
+    def get_tile(self, layer, z, x, y):
+        """
+        Returns the encoded tile and its ETag, rendering it on first request.
+
+        Parameters:
+        - layer (str): One of 'mpa', 'eez', 'ports'.
+        - z, x, y (int): XYZ tile coordinates.
+
+        Returns:
+        - tuple: (bytes GeoJSON FeatureCollection, str ETag)
+        """
+        if layer not in TILE_LAYERS:
+            raise KeyError(f"Unknown tile layer '{layer}'")
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"Invalid tile {z}/{x}/{y}")
+
+        key = (layer, z, x, y)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                self._tiles.move_to_end(key)
+                return cached
+
+        body = self._render(layer, z, x, y)
+        entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        with self._lock:
+            self._tiles[key] = entry
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return entry
+
+    def pregenerate(self, max_zoom=4, layers=TILE_LAYERS):
+        """Renders every non-empty tile up to max_zoom so low zooms never hit a cold cache"""
+        rendered = 0
+        for layer in layers:
+            geometries, _ = _load_layers()[layer]
+            if not len(geometries):
+                continue
+            west, south, east, north = shapely.total_bounds(geometries)
+            for z in range(max_zoom + 1):
+                n = 2 ** z
+                x0, x1 = (int((lon + 180.0) / 360.0 * n) for lon in (west, east))
+                y0, y1 = (
+                    int((1 - math.asinh(math.tan(math.radians(max(min(lat, 85.0511), -85.0511)))) / math.pi) / 2 * n)
+                    for lat in (north, south)
+                )
+                for x in range(max(x0, 0), min(x1, n - 1) + 1):
+                    for y in range(max(y0, 0), min(y1, n - 1) + 1):
+                        self.get_tile(layer, z, x, y)
+                        rendered += 1
+        return rendered
+
+
+zone_tile_cache = ZoneTileCache()
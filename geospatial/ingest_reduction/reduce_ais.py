@@ -0,0 +1,283 @@
+# geospatial/ingest_reduction/reduce_ais.py
+
+import numpy as np
+import pandas as pd
+from numba import njit
+
+from model.model_utils.ais_fields import to_epoch_seconds
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _local_xy(lat, lon):
+    """Project degrees to metres on a per-point equirectangular plane (fine for short hops)"""
+    lat_rad = np.radians(lat)
+    return EARTH_RADIUS_M * np.radians(lon) * np.cos(lat_rad), EARTH_RADIUS_M * lat_rad
+
+
+def _step_distance(lat, lon):
+    """Metres between each point and the previous one (NaN for the first)"""
+    x, y = _local_xy(lat, lon)
+    d = np.full(len(lat), np.nan)
+    d[1:] = np.hypot(np.diff(x), np.diff(y))
+    return d
+
+
+def _segment_starts(df, id_col, break_on):
+    """True where a new vessel starts or any break_on column changes value"""
+    starts = df[id_col].ne(df[id_col].shift()).to_numpy().copy()
+    for col in break_on:
+        starts |= df[col].ne(df[col].shift()).to_numpy()
+    if len(starts):
+        starts[0] = True
+    return starts
+
+
+@njit(cache=True)
+def _thin_near_duplicates(vessel, t, x, y, candidate, time_tolerance_s, distance_tolerance_m):
+    """
+    Keeps a candidate ping unless it is within both tolerances of the last ping
+    *kept* for the same vessel, so the tolerance cannot chain along a slow track.
+    """
+    keep = np.zeros(len(t), dtype=np.bool_)
+    last = -1
+    for i in range(len(t)):
+        if not candidate[i]:
+            continue
+        if (last >= 0 and vessel[i] == vessel[last]
+                and t[i] - t[last] <= time_tolerance_s
+                and np.hypot(x[i] - x[last], y[i] - y[last]) <= distance_tolerance_m):
+            continue
+        keep[i] = True
+        last = i
+    return keep
+
+
+def drop_duplicate_pings(df, t, id_col, lat_col, lon_col,
+                         time_tolerance_s=2.0, distance_tolerance_m=10.0):
+    """
+    Drops exact duplicates and near duplicates (same vessel, within the time and
+    distance tolerance of the last kept ping) from a frame sorted by vessel and time.
+    Each vessel's last ping is always kept.
+
+    Returns:
+    - Boolean keep mask aligned with df.
+    """
+    vessel = pd.factorize(df[id_col])[0]
+    lat = df[lat_col].to_numpy(dtype=float)
+    lon = df[lon_col].to_numpy(dtype=float)
+
+    # keep="last" so the surviving copy of an exact duplicate can be the track's last ping
+    candidate = ~pd.DataFrame({"id": vessel, "t": t, "lat": lat, "lon": lon}).duplicated(keep="last").to_numpy()
+
+    x, y = _local_xy(lat, lon)
+    keep = _thin_near_duplicates(vessel, np.asarray(t, dtype=float), x, y, candidate,
+                                 float(time_tolerance_s), float(distance_tolerance_m))
+    if len(keep):
+        keep[np.r_[vessel[1:] != vessel[:-1], True]] = True
+    return keep
+
+
+def collapse_stationary_runs(df, t, id_col, lat_col, lon_col, speed_col=None, break_on=(),
+                             must_keep=None, speed_threshold=0.5, radius_m=50.0, min_run=3):
+    """
+    Collapses runs of consecutive stationary pings into one dwell record per run.
+
+    A ping is stationary when its speed is below speed_threshold (or, with no
+    speed column, when it moved less than radius_m since the previous ping). A run
+    ends when the vessel changes, a break_on column changes, or the vessel drifts
+    more than radius_m in a single hop; must_keep rows never join a run. Each run
+    of at least min_run pings keeps only its first row, moved to the run's mean
+    position, with dwell_end and dwell_pings describing the collapsed pings.
+
+    Returns:
+    - Tuple (df, t) with the collapsed rows removed and dwell columns added.
+    """
+    lat = df[lat_col].to_numpy(dtype=float)
+    lon = df[lon_col].to_numpy(dtype=float)
+    hop = _step_distance(lat, lon)
+    if speed_col is not None and speed_col in df.columns:
+        stationary = pd.to_numeric(df[speed_col], errors="coerce").to_numpy() < speed_threshold
+    else:
+        stationary = np.nan_to_num(hop, nan=0.0) < radius_m
+
+    if must_keep is not None:
+        stationary &= ~np.asarray(must_keep, dtype=bool)
+
+    boundary = _segment_starts(df, id_col, break_on) | (np.nan_to_num(hop, nan=0.0) > radius_m)
+    run_start = boundary | np.r_[True, stationary[1:] != stationary[:-1]]
+    run_id = np.cumsum(run_start) - 1
+
+    run_size = np.bincount(run_id)
+    in_dwell = stationary & (run_size[run_id] >= min_run)
+    first_of_run = run_start & in_dwell
+    drop = in_dwell & ~run_start
+
+    out = df.copy()
+    out["dwell_end"] = t
+    out["dwell_pings"] = 1
+    if first_of_run.any():
+        dwell_runs = run_id[in_dwell]
+        counts = np.bincount(dwell_runs, minlength=len(run_size))
+        mean_lat = np.bincount(dwell_runs, weights=lat[in_dwell], minlength=len(run_size))
+        mean_lon = np.bincount(dwell_runs, weights=lon[in_dwell], minlength=len(run_size))
+        last_t = np.full(len(run_size), -np.inf)
+        np.maximum.at(last_t, dwell_runs, t[in_dwell])
+
+        heads = run_id[first_of_run]
+        rows = np.flatnonzero(first_of_run)
+        out.iloc[rows, out.columns.get_loc(lat_col)] = mean_lat[heads] / counts[heads]
+        out.iloc[rows, out.columns.get_loc(lon_col)] = mean_lon[heads] / counts[heads]
+        out.iloc[rows, out.columns.get_loc("dwell_end")] = last_t[heads]
+        out.iloc[rows, out.columns.get_loc("dwell_pings")] = counts[heads]
+
+    return out[~drop], t[~drop]
+
+
+def simplify_trajectories(df, t, id_col, lat_col, lon_col, tolerance_m=50.0, break_on=(), must_keep=None):
+    """
+    Error-bounded Douglas-Peucker simplification using the synchronized Euclidean
+    distance, i.e. the distance from each point to where the vessel would be at that
+    time moving uniformly between the segment endpoints. Every dropped ping is
+    within tolerance_m of its time-interpolated position on the kept track.
+
+    All vessels are simplified together: each pass finds the worst point of every
+    open segment with one reduceat, so the number of passes follows the recursion
+    depth rather than the number of vessels.
+
+    Returns:
+    - Boolean keep mask aligned with df.
+    """
+    n = len(df)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+
+    x, y = _local_xy(df[lat_col].to_numpy(dtype=float), df[lon_col].to_numpy(dtype=float))
+    starts = _segment_starts(df, id_col, break_on)
+    # Track endpoints and pinned rows are always kept and split the track
+    anchors = starts | np.r_[starts[1:], True]
+    if must_keep is not None:
+        anchors |= np.asarray(must_keep, dtype=bool)
+    keep[anchors] = True
+
+    # Adjacent anchors across a track boundary have no interior and drop out below
+    anchor_idx = np.flatnonzero(anchors)
+    seg_s, seg_e = anchor_idx[:-1], anchor_idx[1:]
+
+    while len(seg_s):
+        interior = seg_e - seg_s - 1
+        open_seg = interior > 0
+        seg_s, seg_e, interior = seg_s[open_seg], seg_e[open_seg], interior[open_seg]
+        if not len(seg_s):
+            break
+
+        offsets = np.r_[0, np.cumsum(interior)[:-1]]
+        seg_of = np.repeat(np.arange(len(seg_s)), interior)
+        idx = np.repeat(seg_s + 1, interior) + np.arange(interior.sum()) - np.repeat(offsets, interior)
+
+        s, e = seg_s[seg_of], seg_e[seg_of]
+        span = t[e] - t[s]
+        frac = np.where(span > 0, (t[idx] - t[s]) / np.where(span > 0, span, 1.0), 0.5)
+        px = x[s] + frac * (x[e] - x[s])
+        py = y[s] + frac * (y[e] - y[s])
+        dist = np.hypot(x[idx] - px, y[idx] - py)
+
+        worst = np.maximum.reduceat(dist, offsets)
+        split = worst > tolerance_m
+        if not split.any():
+            break
+
+        # Position of the (first) worst point inside each segment
+        is_worst = dist == worst[seg_of]
+        first_worst = np.full(len(seg_s), -1)
+        hits = np.flatnonzero(is_worst)
+        first_worst[seg_of[hits[::-1]]] = idx[hits[::-1]]
+
+        pivot = first_worst[split]
+        keep[pivot] = True
+        seg_s = np.r_[seg_s[split], pivot]
+        seg_e = np.r_[pivot, seg_e[split]]
+
+    return keep
+
+
+def reduce_ais(df,
+               id_col="vessel_id",
+               time_col="timestamp",
+               lat_col="latitude",
+               lon_col="longitude",
+               speed_col="speed",
+               break_on=(),
+               must_keep=None,
+               time_tolerance_s=2.0,
+               distance_tolerance_m=10.0,
+               stationary_speed=0.5,
+               stationary_radius_m=50.0,
+               tolerance_m=50.0):
+    """
+    Vectorized ingest reduction: de-duplication, stationary-run collapse and
+    trajectory simplification, in that order.
+
+    Parameters:
+        df (pd.DataFrame): Raw AIS pings.
+        id_col, time_col, lat_col, lon_col, speed_col (str): Column names. A numeric
+            time column is read as epoch seconds and a missing one falls back to row
+            order; a missing speed column falls back to hop distance for stationarity.
+        break_on (list): Columns whose value changes must be preserved (e.g. behavior).
+        must_keep (array-like of bool): Rows that must survive reduction.
+        time_tolerance_s, distance_tolerance_m (float): Near-duplicate tolerance.
+        stationary_speed (float): Speed (knots) below which a ping counts as stationary.
+        stationary_radius_m (float): Max hop (m) inside a stationary run.
+        tolerance_m (float): Max synchronized distance error for simplification.
+
+    Returns:
+        (pd.DataFrame, dict): Reduced frame (sorted by vessel and time, with
+                              dwell_end and dwell_pings columns) and a stats dict
+                              with per-stage record counts and reduction_ratio.
+    """
+    break_on = [c for c in break_on if c in df.columns]
+    input_records = len(df)
+
+    if time_col in df.columns:
+        t_all = to_epoch_seconds(df[time_col])
+    else:
+        t_all = np.arange(len(df), dtype=float)
+
+    pinned = np.zeros(len(df), dtype=bool) if must_keep is None else np.asarray(must_keep, dtype=bool)
+    work = df.assign(_t=t_all, _pinned=pinned)
+    work = work.dropna(subset=[lat_col, lon_col]).sort_values([id_col, "_t"], kind="stable")
+    t = work["_t"].to_numpy()
+
+    keep = drop_duplicate_pings(work, t, id_col, lat_col, lon_col,
+                                time_tolerance_s, distance_tolerance_m) | work["_pinned"].to_numpy()
+    work, t = work[keep], t[keep]
+    after_dedup = len(work)
+
+    work, t = collapse_stationary_runs(work, t, id_col, lat_col, lon_col,
+                                       speed_col if speed_col in work.columns else None,
+                                       break_on=break_on, must_keep=work["_pinned"].to_numpy(),
+                                       speed_threshold=stationary_speed, radius_m=stationary_radius_m)
+    after_dwell = len(work)
+
+    # Dwell records anchor the simplification so they are never dropped
+    anchors = work["_pinned"].to_numpy() | (work["dwell_pings"].to_numpy() > 1)
+    keep = simplify_trajectories(work, t, id_col, lat_col, lon_col, tolerance_m,
+                                 break_on=break_on, must_keep=anchors)
+    work = work[keep]
+
+    if time_col in work.columns and not pd.api.types.is_numeric_dtype(df[time_col]):
+        dwell_end = pd.to_datetime(work["dwell_end"], unit="s", utc=True)
+        if not isinstance(df[time_col].dtype, pd.DatetimeTZDtype):
+            dwell_end = dwell_end.dt.tz_localize(None)
+        work["dwell_end"] = dwell_end
+    work = work.drop(columns=["_t", "_pinned"])
+
+    stats = {
+        "input_records": input_records,
+        "after_dedup": after_dedup,
+        "after_dwell_collapse": after_dwell,
+        "output_records": len(work),
+        "reduction_ratio": 1.0 - len(work) / input_records if input_records else 0.0,
+    }
+    return work, stats
@@ -7,12 +7,22 @@ import pandas as pd
 # Add root path to import geospatial
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from geospatial.geofencing.fence_utils import load_zone_shapefiles, assign_zone
+from geospatial.geofencing.fence_utils import points_in_zones
+from geospatial.ingest_reduction.reduce_ais import reduce_ais
+
+# Per-point flag columns added by detect_illegal_behavior
+ZONE_FLAGS = ['in_mpa', 'in_eez', 'near_port', 'illegal_fishing']
 
 def detect_illegal_behavior(df, 
                             lon_col="longitude", 
                             lat_col="latitude", 
-                            behavior_col="behavior"):
+                            behavior_col="behavior",
+                            reduce=False,
+                            id_col="vessel_id",
+                            time_col="timestamp",
+                            speed_col="speed",
+                            tolerance_m=50.0,
+                            must_keep=None):
     """
     Assigns zones (MPA, EEZ, Ports) to each vessel point and detects illegal fishing.
 
@@ -21,6 +31,15 @@ def detect_illegal_behavior(df,
         lon_col (str): Name of the longitude column.
         lat_col (str): Name of the latitude column.
         behavior_col (str): Name of the column containing behavior (e.g., 'fishing', 'non-fishing').
+                            Without it no point is flagged as illegal fishing.
+        reduce (bool): Run the ingest reduction stage (dedup, dwell collapse, trajectory
+                       simplification) on the flagged pings. Behavior and zone changes are
+                       preserved, so every kept record carries the flags of its own ping.
+        id_col (str): Name of the vessel id column (used when reduce=True).
+        time_col (str): Name of the timestamp column (used when reduce=True).
+        speed_col (str): Name of the speed column (used when reduce=True).
+        tolerance_m (float): Simplification error bound in metres (used when reduce=True).
+        must_keep (array-like of bool): Rows the reduction must not drop (used when reduce=True).
 
     Returns:
         pd.DataFrame: Same DataFrame with new columns:
@@ -28,15 +47,25 @@ def detect_illegal_behavior(df,
                       - in_eez (bool)
                       - near_port (bool)
                       - illegal_fishing (bool)
+                      With reduce=True the frame is the reduced one (plus dwell_end and
+                      dwell_pings) and df.attrs['reduction'] holds the reduction stats.
     """
 
-    zones = load_zone_shapefiles()
-
-    df = assign_zone(df, zones['mpa'], 'in_mpa', lon_col=lon_col, lat_col=lat_col)
-    df = assign_zone(df, zones['eez'], 'in_eez', lon_col=lon_col, lat_col=lat_col)
-    df = assign_zone(df, zones['ports'], 'near_port', lon_col=lon_col, lat_col=lat_col)
+    # One vectorized point-in-zone pass over every ping
+    in_zones = points_in_zones(pd.to_numeric(df[lon_col], errors='coerce').to_numpy(dtype=float),
+                               pd.to_numeric(df[lat_col], errors='coerce').to_numpy(dtype=float))
+    df = df.assign(in_mpa=in_zones['mpa'], in_eez=in_zones['eez'], near_port=in_zones['ports'])
 
     # Detect illegal fishing: fishing inside MPA
-    df['illegal_fishing'] = (df['in_mpa']) & (df[behavior_col] == 'fishing')
+    if behavior_col in df.columns:
+        df['illegal_fishing'] = (df['in_mpa']) & (df[behavior_col] == 'fishing')
+    else:
+        df['illegal_fishing'] = False
+
+    if reduce:
+        df, stats = reduce_ais(df, id_col=id_col, time_col=time_col, lat_col=lat_col, lon_col=lon_col,
+                               speed_col=speed_col, break_on=[behavior_col, *ZONE_FLAGS],
+                               must_keep=must_keep, tolerance_m=tolerance_m)
+        df.attrs['reduction'] = stats
 
     return df
@@ -0,0 +1,301 @@
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numba import njit
+
+from model.model_utils.ais_fields import resolve_columns, to_epoch_seconds
+
+# Default location of the persisted per-vessel baselines
+ANOMALY_STATE_PATH = os.environ.get(
+    "ANOMALY_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "online_state.npz")
+)
+
+# Features tracked per vessel, in column order of the stats arrays
+FEATURES = ["sog", "cog_rate", "turn_rate", "log_gap"]
+
+# Smallest std each feature is scored with, in feature units (knots, deg/min, deg/min,
+# log seconds), so a perfectly regular baseline doesn't turn tiny blips into anomalies
+MIN_STD = (0.5, 2.0, 2.0, 0.25)
+
+
+@njit(cache=True)
+def _score_pings(slots, ts, sog, cog, heading, count, mean, var, last_ts, last_cog, last_heading,
+                 last_turn, last_score, min_std, alpha, min_samples, z_threshold, z_scale, update):
+    """
+    Score pings one after another and, with `update`, absorb them into the per-slot
+    state arrays in place. Pings of one vessel must be in time order; pings of
+    different vessels may be interleaved freely.
+
+    Only a ping newer than the vessel's last one is absorbed. A repeat of the last
+    ping (same timestamp) returns that ping's score again, and an out-of-order ping
+    is scored against the baseline without changing it.
+
+    Returns an array of anomaly scores in [0, 1]: 0 until the largest feature
+    z-score passes `z_threshold`, approaching 1 as it grows. Features with
+    fewer than `min_samples` observations are not scored.
+    """
+    n_features = mean.shape[1]
+    scores = np.zeros(len(slots))
+    x = np.empty(n_features)
+    for i in range(len(slots)):
+        s = slots[i]
+        first = np.isnan(last_ts[s])
+        gap = ts[i] - last_ts[s]
+        if gap == 0:
+            scores[i] = last_score[s]
+            continue
+        valid_gap = gap > 0
+        minutes = gap / 60.0 if valid_gap else np.nan
+
+        x[0] = sog[i]
+        x[1] = abs((cog[i] - last_cog[s] + 180.0) % 360.0 - 180.0) / minutes
+        x[2] = abs((heading[i] - last_heading[s] + 180.0) % 360.0 - 180.0) / minutes
+        x[3] = np.log1p(gap) if valid_gap else np.nan
+
+        # Score against the baseline before this ping is folded in
+        z_max = 0.0
+        for f in range(n_features):
+            if not np.isnan(x[f]) and count[s, f] >= min_samples:
+                z = abs(x[f] - mean[s, f]) / max(np.sqrt(var[s, f]), min_std[f])
+                if z > z_max:
+                    z_max = z
+        scores[i] = 1.0 - np.exp(-max(z_max - z_threshold, 0.0) / z_scale)
+
+        if not update or not (first or valid_gap):
+            continue
+
+        # Welford-style warm-up (1/n) that settles into an EWMA with weight alpha
+        for f in range(n_features):
+            if np.isnan(x[f]):
+                continue
+            count[s, f] += 1
+            weight = max(alpha, 1.0 / count[s, f])
+            delta = x[f] - mean[s, f]
+            mean[s, f] += weight * delta
+            var[s, f] = (1.0 - weight) * (var[s, f] + weight * delta * delta)
+
+        if valid_gap and not np.isnan(cog[i]) and not np.isnan(last_cog[s]):
+            last_turn[s] = ((cog[i] - last_cog[s] + 180.0) % 360.0 - 180.0) / minutes
+        last_ts[s] = ts[i]
+        last_score[s] = scores[i]
+        if not np.isnan(cog[i]):
+            last_cog[s] = cog[i]
+        if not np.isnan(heading[i]):
+            last_heading[s] = heading[i]
+    return scores
+
+
+def _ping_seconds(timestamp: Any) -> float:
+    """Epoch seconds of a live ping timestamp (now when missing, naive times read as UTC)"""
+    ts = pd.Timestamp(timestamp or datetime.now())
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).timestamp()
+
+
+class OnlineAnomalyScorer:
+    """
+    Streaming per-vessel anomaly scorer.
+
+    Each vessel owns one slot in a set of flat arrays holding its last ping and
+    an exponentially weighted mean/variance per feature. The weight starts at
+    1/n (exact Welford running moments) and settles to `alpha`, so early pings
+    build a baseline and later pings track drift. Scoring a ping reads and
+    updates only its own slot, so the cost is constant per ping.
+    """
+
+    def __init__(self, alpha: float = 0.05, min_samples: int = 10, z_threshold: float = 3.0,
+                 z_scale: float = 2.0, min_std: Optional[Sequence[float]] = None,
+                 initial_capacity: int = 1024):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.z_scale = z_scale
+        self.min_std = np.array(MIN_STD if min_std is None else min_std, dtype=float)
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int):
+        self.count = np.zeros((capacity, len(FEATURES)), dtype=np.int64)
+        self.mean = np.zeros((capacity, len(FEATURES)), dtype=float)
+        self.var = np.zeros((capacity, len(FEATURES)), dtype=float)
+        self.last_ts = np.full(capacity, np.nan)
+        self.last_cog = np.full(capacity, np.nan)
+        self.last_heading = np.full(capacity, np.nan)
+        self.last_turn = np.zeros(capacity)
+        self.last_score = np.zeros(capacity)
+
+    def _grow(self, needed: int):
+        capacity = len(self.last_ts)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        pad = new_capacity - capacity
+        self.count = np.vstack([self.count, np.zeros((pad, len(FEATURES)), dtype=np.int64)])
+        self.mean = np.vstack([self.mean, np.zeros((pad, len(FEATURES)))])
+        self.var = np.vstack([self.var, np.zeros((pad, len(FEATURES)))])
+        self.last_ts = np.concatenate([self.last_ts, np.full(pad, np.nan)])
+        self.last_cog = np.concatenate([self.last_cog, np.full(pad, np.nan)])
+        self.last_heading = np.concatenate([self.last_heading, np.full(pad, np.nan)])
+        self.last_turn = np.concatenate([self.last_turn, np.zeros(pad)])
+        self.last_score = np.concatenate([self.last_score, np.zeros(pad)])
+
+    def _slots_for(self, vessel_ids) -> np.ndarray:
+        """Return the slot index for each vessel id, assigning new slots as needed"""
+        slots = np.empty(len(vessel_ids), dtype=np.int64)
+        for i, vessel_id in enumerate(vessel_ids):
+            slot = self._slots.get(vessel_id)
+            if slot is None:
+                slot = len(self._slots)
+                self._slots[vessel_id] = slot
+            slots[i] = slot
+        self._grow(len(self._slots))
+        return slots
+
+    @property
+    def vessel_count(self) -> int:
+        return len(self._slots)
+
+    def _step(self, slots: np.ndarray, ts: np.ndarray, sog: np.ndarray,
+              cog: np.ndarray, heading: np.ndarray, update: bool = True) -> np.ndarray:
+        """Score (and absorb, with update) pings in the given order (see _score_pings)"""
+        return _score_pings(slots, ts, sog, cog, heading, self.count, self.mean, self.var,
+                            self.last_ts, self.last_cog, self.last_heading, self.last_turn, self.last_score,
+                            self.min_std, float(self.alpha), int(self.min_samples),
+                            float(self.z_threshold), float(self.z_scale), update)
+
+    def score_ping(self, vessel_id: str, timestamp: Any = None, speed: Optional[float] = None,
+                   course: Optional[float] = None, heading: Optional[float] = None,
+                   update: bool = True) -> float:
+        """
+        Score a single live ping and, with update, fold it into the vessel's baseline.
+        Each (vessel, timestamp) is absorbed at most once: scoring the same ping again
+        returns the same score and leaves the baseline alone.
+        """
+        ts = np.array([_ping_seconds(timestamp)])
+        with self._lock:
+            slots = self._slots_for([str(vessel_id)])
+            score = self._step(
+                slots, ts,
+                np.array([np.nan if speed is None else speed], dtype=float),
+                np.array([np.nan if course is None else course], dtype=float),
+                np.array([np.nan if heading is None else heading], dtype=float),
+                update=update,
+            )
+        return float(score[0])
+
+    def turn_rate(self, vessel_id: str, timestamp: Any = None, course: Optional[float] = None) -> float:
+        """
+        Signed turn rate (deg/min, positive = starboard) of a live ping against the
+        vessel's last absorbed ping, without changing any state. A repeat of the last
+        ping, or a ping whose rate can't be measured, gets the last measured rate;
+        an unknown vessel gets 0.
+        """
+        with self._lock:
+            slot = self._slots.get(str(vessel_id))
+            if slot is None:
+                return 0.0
+            gap = _ping_seconds(timestamp) - self.last_ts[slot]
+            last_cog = self.last_cog[slot]
+            if course is None or np.isnan(last_cog) or not gap > 0:
+                return float(self.last_turn[slot])
+        return float(((course - last_cog + 180.0) % 360.0 - 180.0) / (gap / 60.0))
+
+    def score_frame(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Score every ping in a DataFrame, updating baselines as if streamed in time order.
+
+        Pings are sorted by vessel and time and streamed through one compiled pass,
+        so the cost is linear in the number of pings however they split across vessels.
+
+        Returns:
+        - Series of anomaly scores aligned with df.index
+        """
+        cols = resolve_columns(df)
+        if cols["vessel_id"] is None or len(df) == 0:
+            return pd.Series(0.0, index=df.index, name="anomaly_score")
+
+        def column(field):
+            name = cols[field]
+            if name is None:
+                return np.full(len(df), np.nan)
+            return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+        ids = df[cols["vessel_id"]].astype(str).to_numpy()
+        if cols["timestamp"] is not None:
+            ts = to_epoch_seconds(df[cols["timestamp"]])
+        else:
+            ts = np.arange(len(df), dtype=float)
+        sog, cog, heading = column("sog"), column("cog"), column("heading")
+
+        order = np.lexsort((ts, ids))
+        scores = np.zeros(len(df), dtype=float)
+        with self._lock:
+            unique_ids, inverse = np.unique(ids, return_inverse=True)
+            slot_of_row = self._slots_for(unique_ids.tolist())[inverse]
+            scores[order] = self._step(slot_of_row[order], ts[order], sog[order], cog[order], heading[order])
+
+        return pd.Series(scores, index=df.index, name="anomaly_score")
+
+    def save(self, path: str = ANOMALY_STATE_PATH):
+        """Snapshot all per-vessel baselines to an .npz file (written atomically)"""
+        with self._lock:
+            n = len(self._slots)
+            ids = np.array(sorted(self._slots, key=self._slots.get), dtype=str)
+            state = {
+                "vessel_ids": ids,
+                "count": self.count[:n],
+                "mean": self.mean[:n],
+                "var": self.var[:n],
+                "last_ts": self.last_ts[:n],
+                "last_cog": self.last_cog[:n],
+                "last_heading": self.last_heading[:n],
+                "last_turn": self.last_turn[:n],
+                "last_score": self.last_score[:n],
+                "min_std": self.min_std,
+                "params": np.array([self.alpha, self.min_samples, self.z_threshold, self.z_scale]),
+            }
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = ANOMALY_STATE_PATH) -> "OnlineAnomalyScorer":
+        """Restore a scorer from a snapshot written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            alpha, min_samples, z_threshold, z_scale = data["params"]
+            ids = data["vessel_ids"].tolist()
+            scorer = cls(alpha=float(alpha), min_samples=int(min_samples), z_threshold=float(z_threshold),
+                         z_scale=float(z_scale), min_std=data["min_std"] if "min_std" in data else None,
+                         initial_capacity=max(len(ids), 1))
+            scorer._slots = {vessel_id: i for i, vessel_id in enumerate(ids)}
+            n = len(ids)
+            scorer.count[:n] = data["count"]
+            scorer.mean[:n] = data["mean"]
+            scorer.var[:n] = data["var"]
+            scorer.last_ts[:n] = data["last_ts"]
+            scorer.last_cog[:n] = data["last_cog"]
+            scorer.last_heading[:n] = data["last_heading"]
+            if "last_turn" in data:
+                scorer.last_turn[:n] = data["last_turn"]
+            if "last_score" in data:
+                scorer.last_score[:n] = data["last_score"]
+        return scorer
+
+
+_scorer: Optional[OnlineAnomalyScorer] = None
+
+
+def get_anomaly_scorer() -> OnlineAnomalyScorer:
+    """Return the process-wide scorer, restoring the last snapshot if one exists"""
+    global _scorer
+    if _scorer is None:
+        if os.path.exists(ANOMALY_STATE_PATH):
+            _scorer = OnlineAnomalyScorer.load(ANOMALY_STATE_PATH)
+        else:
+            _scorer = OnlineAnomalyScorer()
+    return _scorer
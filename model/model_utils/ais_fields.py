@@ -0,0 +1,36 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Accepted column names for each AIS field, first match wins
+COLUMN_ALIASES = {
+    "vessel_id": ["vessel_id", "MMSI", "mmsi"],
+    "timestamp": ["timestamp", "BaseDateTime", "# Timestamp"],
+    "latitude": ["latitude", "LAT", "lat", "Latitude"],
+    "longitude": ["longitude", "LON", "lon", "Longitude"],
+    "sog": ["speed", "SOG", "sog"],
+    "cog": ["course", "COG", "cog"],
+    "heading": ["heading", "Heading"],
+}
+
+
+def resolve_columns(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """Map each field in COLUMN_ALIASES to the first matching column in df (or None)"""
+    return {
+        field: next((c for c in aliases if c in df.columns), None)
+        for field, aliases in COLUMN_ALIASES.items()
+    }
+
+
+def to_epoch_seconds(values: Any) -> np.ndarray:
+    """
+    Convert timestamps to float epoch seconds. Numbers are taken to already be epoch
+    seconds; anything else is parsed as datetimes (naive values count as UTC).
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    ts = pd.to_datetime(series, errors="coerce", utc=True)
+    seconds = (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+    return seconds.to_numpy(dtype=float, na_value=np.nan)
@@ -1,17 +1,25 @@
 # Cell 1: Set base model directory and list subfolders
 
 import os
+import hmac
+import time
+import threading
 import joblib
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Tuple, Any
-from fastapi import APIRouter, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from model.model_utils.model_registry import ModelRegistry
 
 # Base directory where all models are saved
 MODEL_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Shared secret for the model admin endpoints (deploy/promote/cancel-shadow); unset disables them
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN", "")
+
 
 # Define subdirectories for each dataset model group
 AIS_DIR = os.path.join(MODEL_BASE_DIR, "ais")
@@ -76,6 +84,18 @@ class ModelAgent(ABC):
         self.scaler = scaler
         self.encoder = encoder
         self.confidence_threshold = 0.7
+        self.version = None
+        self.inflight = 0
+        self._inflight_lock = threading.Lock()
+    
+    def acquire(self):
+        """Mark a request as running on this agent (used to drain it before a swap)"""
+        with self._inflight_lock:
+            self.inflight += 1
+    
+    def release(self):
+        with self._inflight_lock:
+            self.inflight -= 1
     
     @abstractmethod
     def get_purpose(self) -> str:
@@ -217,6 +237,8 @@ class AgentRouter:
     def __init__(self):
         self.agents = {}
         self.default_agent = None
+        self.shadow_agents = {}
+        self.shadow_callback = None
     
     def register_agent(self, key: str, agent: ModelAgent, is_default: bool = False):
         """Register an agent with the router"""
@@ -225,6 +247,36 @@ class AgentRouter:
             self.default_agent = agent
         print(f"Registered agent: {agent.name}")
     
+    def swap_agent(self, key: str, agent: ModelAgent) -> Optional[ModelAgent]:
+        """Atomically replace the agent under a key and return the previous one"""
+        old = self.agents.get(key)
+        self.agents[key] = agent
+        if old is not None and self.default_agent is old:
+            self.default_agent = agent
+        print(f"Swapped agent: {agent.name} ({getattr(old, 'version', None)} -> {agent.version})")
+        return old
+    
+    def _run_agent(self, key: str, input_data: pd.DataFrame) -> Dict[str, Any]:
+        """Predict on the current agent for a key, holding it against a concurrent swap"""
+        while True:
+            agent = self.agents[key]
+            agent.acquire()
+            if self.agents.get(key) is agent:
+                break
+            agent.release()
+        
+        try:
+            started = time.perf_counter()
+            result = agent.predict(input_data)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        finally:
+            agent.release()
+        
+        result['model_version'] = agent.version
+        if self.shadow_callback is not None and key in self.shadow_agents:
+            self.shadow_callback(key, input_data, result, elapsed_ms)
+        return result
+    
     def find_compatible_agents(self, input_data: pd.DataFrame) -> List[str]:
         """Find all agents that can handle the input"""
         compatible = []
@@ -238,8 +290,7 @@ class AgentRouter:
         
         # If specific agent requested, use it
         if preferred_agent and preferred_agent in self.agents:
-            agent = self.agents[preferred_agent]
-            result = agent.predict(input_data)
+            result = self._run_agent(preferred_agent, input_data)
             result['routing_info'] = f"Used requested agent: {preferred_agent}"
             return result
         
@@ -256,9 +307,8 @@ class AgentRouter:
         
         # Use first compatible agent (can be enhanced with scoring)
         chosen_agent_key = compatible_agents[0]
-        agent = self.agents[chosen_agent_key]
         
-        result = agent.predict(input_data)
+        result = self._run_agent(chosen_agent_key, input_data)
         result['routing_info'] = f"Auto-selected agent: {chosen_agent_key}"
         result['compatible_agents'] = compatible_agents
         
@@ -270,6 +320,7 @@ class AgentRouter:
         for key, agent in self.agents.items():
             info[key] = {
                 "name": agent.name,
+                "version": agent.version,
                 "purpose": agent.get_purpose(),
                 "required_features": agent.get_required_features()
             }
@@ -321,6 +372,19 @@ try:
 except Exception as e:
     print(f"Error initializing agents: {e}")
 
+# Versioned bundles can be hot-swapped into the router without a restart
+model_registry = ModelRegistry(
+    agent_router,
+    agent_classes={
+        'ais': AISAgent,
+        'fishing': FishingTrajectoriesAgent,
+        'kattegat': KattegatAgent
+    },
+    bundle_loader=load_model_bundle
+)
+for key in list(agent_router.agents):
+    model_registry.register_initial(key)
+
 # Create FastAPI router
 router = APIRouter()
 
@@ -345,6 +409,54 @@ class VesselPredictionRequest(BaseModel):
     area: Optional[float] = None
     preferred_agent: Optional[str] = None
 
+class ModelDeployRequest(BaseModel):
+    bundle_dir: str
+    version: str
+    shadow_fraction: float = Field(0.0, ge=0, le=1)
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Gate model admin endpoints behind the MODEL_ADMIN_TOKEN shared secret"""
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model admin endpoints are disabled (MODEL_ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode("utf-8"), MODEL_ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+def resolve_bundle_dir(bundle_dir: str) -> str:
+    """Resolve a bundle directory, which must be a subdirectory of MODEL_BASE_DIR"""
+    base = os.path.realpath(MODEL_BASE_DIR)
+    path = os.path.realpath(os.path.join(base, bundle_dir))
+    if path == base or os.path.commonpath([base, path]) != base:
+        raise ValueError("bundle_dir must be a subdirectory of the model directory")
+    if not os.path.isdir(path):
+        raise ValueError(f"Bundle directory '{bundle_dir}' does not exist")
+    return path
+
+@router.get("/models")
+def list_model_versions():
+    return model_registry.status()
+
+@router.post("/models/{agent_key}/deploy", dependencies=[Depends(require_admin_token)])
+def deploy_model_version(agent_key: str, request: ModelDeployRequest):
+    try:
+        return model_registry.deploy(agent_key, resolve_bundle_dir(request.bundle_dir), request.version,
+                                     shadow_fraction=request.shadow_fraction)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/models/{agent_key}/promote", dependencies=[Depends(require_admin_token)])
+def promote_model_version(agent_key: str):
+    try:
+        return model_registry.promote(agent_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/models/{agent_key}/cancel-shadow", dependencies=[Depends(require_admin_token)])
+def cancel_shadow_model(agent_key: str):
+    try:
+        return model_registry.cancel_shadow(agent_key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/predict")
 def predict_vessel_behavior(request: VesselPredictionRequest):
     input_df = pd.DataFrame([request.dict()])
@@ -0,0 +1,241 @@
+import gc
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Type
+
+import numpy as np
+import pandas as pd
+
+
+def make_warmup_rows(agent, n_rows: int = 32, seed: int = 0) -> pd.DataFrame:
+    """Synthetic numeric rows covering the agent's required features"""
+    rng = np.random.default_rng(seed)
+    features = agent.get_required_features()
+    return pd.DataFrame(rng.uniform(0.0, 100.0, size=(n_rows, len(features))), columns=features)
+
+
+class ShadowStats:
+    """Running latency and agreement deltas between the live agent and its shadow candidate"""
+
+    def __init__(self, version: str, fraction: float):
+        self.version = version
+        self.fraction = fraction
+        self.samples = 0
+        self.agreements = 0
+        self.candidate_errors = 0
+        self.dropped = 0
+        self.live_latency_ms = 0.0
+        self.candidate_latency_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, live_ms: float, candidate_ms: float, agreed: bool, candidate_ok: bool):
+        with self._lock:
+            self.samples += 1
+            self.agreements += int(agreed)
+            self.candidate_errors += int(not candidate_ok)
+            self.live_latency_ms += live_ms
+            self.candidate_latency_ms += candidate_ms
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            n = max(self.samples, 1)
+            live = self.live_latency_ms / n
+            candidate = self.candidate_latency_ms / n
+            return {
+                "candidate_version": self.version,
+                "fraction": self.fraction,
+                "samples": self.samples,
+                "dropped": self.dropped,
+                "agreement_rate": self.agreements / n if self.samples else None,
+                "candidate_errors": self.candidate_errors,
+                "live_latency_ms": live,
+                "candidate_latency_ms": candidate,
+                "latency_delta_ms": candidate - live,
+            }
+
+
+class ModelRegistry:
+    """
+    Versioned model bundles for an AgentRouter, swapped in without a restart.
+
+    A deploy loads the bundle on a background thread, warms the new agent up on
+    synthetic rows and then either swaps it into the router (the live agent is
+    drained of in-flight requests and freed once idle) or installs it as a shadow
+    that scores a fraction of live traffic off the request path.
+    """
+
+    def __init__(self, router, agent_classes: Dict[str, Type], bundle_loader: Callable[[str], Dict[str, Any]],
+                 drain_timeout: float = 30.0, max_shadow_backlog: int = 64):
+        self.router = router
+        self.agent_classes = agent_classes
+        self.bundle_loader = bundle_loader
+        self.drain_timeout = drain_timeout
+        self.max_shadow_backlog = max_shadow_backlog
+        self.deployments: Dict[str, Dict[str, Any]] = {}
+        self.shadow_stats: Dict[str, ShadowStats] = {}
+        self._lock = threading.Lock()
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_backlog = 0
+        router.shadow_callback = self._on_live_prediction
+
+    def register_initial(self, key: str, version: str = "initial"):
+        """Record the version of an agent that was registered at import time"""
+        agent = self.router.agents[key]
+        agent.version = version
+        self.deployments[key] = {"active": version, "status": "active", "history": []}
+
+    def deploy(self, key: str, bundle_dir: str, version: str,
+               shadow_fraction: float = 0.0, warmup_rows: int = 32) -> Dict[str, Any]:
+        """
+        Start loading a new bundle for an agent in the background.
+
+        Parameters:
+        - key: Router key of the agent ('ais', 'fishing', 'kattegat')
+        - bundle_dir: Directory holding the new model/scaler/encoder files
+        - version: Label for the new bundle
+        - shadow_fraction: 0 swaps the bundle in once warm; >0 runs it in shadow
+          on that fraction of live traffic until promote() is called
+
+        Returns:
+        - The deployment status dict for the agent
+        """
+        if key not in self.agent_classes:
+            raise ValueError(f"Unknown agent '{key}'")
+        if not 0.0 <= shadow_fraction <= 1.0:
+            raise ValueError(f"shadow_fraction must be between 0 and 1, got {shadow_fraction}")
+        with self._lock:
+            state = self.deployments.setdefault(key, {"active": None, "history": []})
+            if state.get("status") == "loading":
+                raise RuntimeError(f"A deployment for '{key}' is already in progress")
+            state.update({"candidate": version, "status": "loading", "error": None})
+
+        thread = threading.Thread(
+            target=self._load_and_install,
+            args=(key, bundle_dir, version, shadow_fraction, warmup_rows),
+            name=f"deploy-{key}-{version}",
+            daemon=True
+        )
+        thread.start()
+        return self.status(key)
+
+    def _load_and_install(self, key, bundle_dir, version, shadow_fraction, warmup_rows):
+        state = self.deployments[key]
+        try:
+            bundle = self.bundle_loader(bundle_dir)
+            if bundle.get("model") is None:
+                raise ValueError(f"No model file found in {bundle_dir}")
+
+            live = self.router.agents.get(key)
+            agent = self.agent_classes[key](
+                name=live.name if live is not None else key,
+                model=bundle["model"],
+                scaler=bundle.get("scaler"),
+                encoder=bundle.get("encoder")
+            )
+            agent.version = version
+
+            # Warm-up: first calls pay for lazy init, caches and page faults here, not on traffic
+            rows = make_warmup_rows(agent, warmup_rows)
+            started = time.perf_counter()
+            for i in range(len(rows)):
+                result = agent.predict(rows.iloc[[i]])
+                if not result.get("success"):
+                    raise ValueError(f"Warm-up prediction failed: {result.get('error')}")
+            state["warmup_ms_per_row"] = (time.perf_counter() - started) * 1000 / max(len(rows), 1)
+
+            if shadow_fraction > 0:
+                self.shadow_stats[key] = ShadowStats(version, shadow_fraction)
+                self.router.shadow_agents[key] = (agent, shadow_fraction)
+                state["status"] = "shadow"
+            else:
+                self._swap(key, agent)
+        except Exception as e:
+            state.update({"status": "failed", "error": str(e), "candidate": None})
+
+    def promote(self, key: str) -> Dict[str, Any]:
+        """Swap the current shadow candidate in as the live agent"""
+        shadow = self.router.shadow_agents.pop(key, None)
+        if shadow is None:
+            raise ValueError(f"No shadow candidate for '{key}'")
+        threading.Thread(target=self._swap, args=(key, shadow[0]), daemon=True).start()
+        return self.status(key)
+
+    def cancel_shadow(self, key: str) -> Dict[str, Any]:
+        """Drop the shadow candidate without touching the live agent"""
+        with self._lock:
+            state = self.deployments.get(key, {})
+            # The loader would install the shadow after this returned
+            if state.get("status") == "loading":
+                raise RuntimeError(f"A deployment for '{key}' is still loading; cancel it once it is in shadow")
+            # Not freed explicitly: a queued shadow job may still hold it, GC reclaims it after
+            self.router.shadow_agents.pop(key, None)
+            state.update({"status": "active", "candidate": None})
+        return self.status(key)
+
+    def _swap(self, key: str, agent):
+        state = self.deployments[key]
+        old = self.router.swap_agent(key, agent)
+        retired = {"version": state.get("active"), "retired_at": datetime.now().isoformat()}
+        state["history"].append(retired)
+        state.update({"active": agent.version, "candidate": None, "status": "draining"})
+
+        # Requests already inside the old agent finish on it; new ones see the new agent
+        if old is not None:
+            deadline = time.monotonic() + self.drain_timeout
+            while old.inflight > 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # Still busy after the timeout: leave it to the running requests and let GC reclaim it
+            retired["drained"] = old.inflight == 0
+            if retired["drained"]:
+                self._free(old)
+        state["status"] = "active"
+
+    @staticmethod
+    def _free(agent):
+        agent.model = None
+        agent.scaler = None
+        agent.encoder = None
+        gc.collect()
+
+    def _on_live_prediction(self, key: str, input_data: pd.DataFrame, result: Dict[str, Any], live_ms: float):
+        """Router hook: sample live traffic onto the shadow candidate, off the request path"""
+        shadow = self.router.shadow_agents.get(key)
+        if shadow is None:
+            return
+        agent, fraction = shadow
+        if random.random() >= fraction:
+            return
+        stats = self.shadow_stats.get(key)
+        with self._lock:
+            if self._shadow_backlog >= self.max_shadow_backlog:
+                if stats is not None:
+                    stats.dropped += 1
+                return
+            self._shadow_backlog += 1
+        self._shadow_pool.submit(self._score_shadow, agent, stats, input_data.copy(), result, live_ms)
+
+    def _score_shadow(self, agent, stats, input_data, live_result, live_ms):
+        try:
+            started = time.perf_counter()
+            candidate = agent.predict(input_data)
+            candidate_ms = (time.perf_counter() - started) * 1000
+            agreed = bool(np.all(np.asarray(candidate.get("prediction")) == np.asarray(live_result.get("prediction"))))
+            if stats is not None:
+                stats.record(live_ms, candidate_ms, agreed, bool(candidate.get("success")))
+        finally:
+            with self._lock:
+                self._shadow_backlog -= 1
+
+    def status(self, key: Optional[str] = None) -> Dict[str, Any]:
+        """Deployment state (and shadow report, if any) per agent"""
+        keys = [key] if key is not None else list(self.deployments)
+        out = {}
+        for k in keys:
+            state = dict(self.deployments.get(k, {}))
+            if k in self.router.shadow_agents and k in self.shadow_stats:
+                state["shadow"] = self.shadow_stats[k].report()
+            out[k] = state
+        return out
@@ -0,0 +1,291 @@
+"""
+Compiled per-vessel feature kernels.
+
+Every kernel works on flat NumPy arrays sorted by (vessel, time) plus an
+`offsets` array marking where each vessel's segment starts (see
+`segment_offsets`), so per-MMSI features need no groupby, shift or
+intermediate DataFrame. Kernels are compiled with `cache=True`, so the JIT
+cost is paid once per machine rather than once per process.
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from numba import njit
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def sort_by_vessel(ids, times) -> np.ndarray:
+    """Return the permutation that sorts pings by vessel, then time"""
+    return np.lexsort((np.asarray(times), np.asarray(ids)))
+
+
+def segment_offsets(sorted_ids) -> np.ndarray:
+    """Start index of each vessel segment in a sorted id array, plus a final len(ids) sentinel"""
+    sorted_ids = np.asarray(sorted_ids)
+    if len(sorted_ids) == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    return np.r_[starts, len(sorted_ids)].astype(np.int64)
+
+
+@njit(cache=True)
+def track_deltas(lat, lon, speed, times, offsets):
+    """
+    Per-ping deltas to the previous ping of the same vessel (NaN on each vessel's
+    first ping): speed difference, time difference (s) and haversine distance (m).
+    Matches the sog_diff / time_diff / distance features of the fishing models.
+    """
+    n = len(lat)
+    sog_diff = np.full(n, np.nan)
+    time_diff = np.full(n, np.nan)
+    distance = np.full(n, np.nan)
+    for s in range(len(offsets) - 1):
+        for i in range(offsets[s] + 1, offsets[s + 1]):
+            sog_diff[i] = speed[i] - speed[i - 1]
+            time_diff[i] = times[i] - times[i - 1]
+            phi1 = np.radians(lat[i - 1])
+            phi2 = np.radians(lat[i])
+            dphi = phi2 - phi1
+            dlam = np.radians(lon[i] - lon[i - 1])
+            a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+            distance[i] = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(min(a, 1.0)))
+    return sog_diff, time_diff, distance
+
+
+@njit(cache=True)
+def turn_rate(course, times, offsets):
+    """Signed course change per minute to the previous ping (deg/min, positive = starboard)"""
+    n = len(course)
+    out = np.full(n, np.nan)
+    for s in range(len(offsets) - 1):
+        for i in range(offsets[s] + 1, offsets[s + 1]):
+            dt = times[i] - times[i - 1]
+            if dt > 0:
+                delta = (course[i] - course[i - 1] + 180.0) % 360.0 - 180.0
+                out[i] = delta / (dt / 60.0)
+    return out
+
+
+@njit(cache=True)
+def acceleration(speed, times, offsets):
+    """Speed change per minute to the previous ping (knots/min)"""
+    n = len(speed)
+    out = np.full(n, np.nan)
+    for s in range(len(offsets) - 1):
+        for i in range(offsets[s] + 1, offsets[s + 1]):
+            dt = times[i] - times[i - 1]
+            if dt > 0:
+                out[i] = (speed[i] - speed[i - 1]) / (dt / 60.0)
+    return out
+
+
+@njit(cache=True)
+def _rolling_window(values, times, offsets, window, by_time, ddof=1):
+    """
+    Shared rolling kernel: mean, std, min, max over a trailing window that ends at
+    (and includes) each ping. The window is the last `window` pings, or the pings in
+    (t - window, t] seconds when by_time is set, as in pandas rolling('600s'). std
+    uses `count - ddof` in the denominator (ddof=1 is the pandas default) and is NaN
+    while the window holds `ddof` or fewer values. Welford add/remove updates give
+    mean/std in O(1) per step without the cancellation of running sums of squares;
+    monotonic deques give min/max in amortised O(1). NaN values are skipped.
+    """
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    vmin = np.full(n, np.nan)
+    vmax = np.full(n, np.nan)
+    min_q = np.empty(n, dtype=np.int64)
+    max_q = np.empty(n, dtype=np.int64)
+
+    for s in range(len(offsets) - 1):
+        start, end = offsets[s], offsets[s + 1]
+        left = start
+        m = 0.0
+        m2 = 0.0
+        count = 0
+        min_head = min_tail = 0
+        max_head = max_tail = 0
+
+        for i in range(start, end):
+            x = values[i]
+            if not np.isnan(x):
+                count += 1
+                d = x - m
+                m += d / count
+                m2 += d * (x - m)
+                while min_tail > min_head and values[min_q[min_tail - 1]] >= x:
+                    min_tail -= 1
+                min_q[min_tail] = i
+                min_tail += 1
+                while max_tail > max_head and values[max_q[max_tail - 1]] <= x:
+                    max_tail -= 1
+                max_q[max_tail] = i
+                max_tail += 1
+
+            # Evict pings that fell out of the trailing window
+            while left <= i and ((by_time and times[i] - times[left] >= window)
+                                 or (not by_time and i - left + 1 > window)):
+                y = values[left]
+                if not np.isnan(y):
+                    if count == 1:
+                        count = 0
+                        m = 0.0
+                        m2 = 0.0
+                    else:
+                        count -= 1
+                        d = y - m
+                        m -= d / count
+                        m2 = max(m2 - d * (y - m), 0.0)
+                if min_tail > min_head and min_q[min_head] == left:
+                    min_head += 1
+                if max_tail > max_head and max_q[max_head] == left:
+                    max_head += 1
+                left += 1
+
+            if count > 0:
+                mean[i] = m
+                if count > ddof:
+                    std[i] = np.sqrt(m2 / (count - ddof))
+                vmin[i] = values[min_q[min_head]]
+                vmax[i] = values[max_q[max_head]]
+
+    return mean, std, vmin, vmax
+
+
+@njit(cache=True)
+def rolling_circular(course, times, offsets, window, by_time):
+    """
+    Rolling circular mean (deg, 0-360) and circular std (deg) of a bearing over a
+    trailing window, so courses either side of north average correctly.
+    """
+    radians = np.radians(course)
+    sin_mean, _, _, _ = _rolling_window(np.sin(radians), times, offsets, window, by_time)
+    cos_mean, _, _, _ = _rolling_window(np.cos(radians), times, offsets, window, by_time)
+    mean = np.degrees(np.arctan2(sin_mean, cos_mean)) % 360.0
+    r = np.minimum(np.sqrt(sin_mean ** 2 + cos_mean ** 2), 1.0)
+    std = np.degrees(np.sqrt(-2.0 * np.log(np.maximum(r, 1e-12))))
+    return mean, std
+
+
+def rolling_stats(values, times, offsets, window, by_time: bool = True, ddof: int = 1):
+    """
+    Rolling mean, std, min and max per vessel (std with pandas' default ddof=1).
+
+    Parameters:
+    - values: float array sorted by vessel and time
+    - times: epoch seconds, same order (only used when by_time=True)
+    - offsets: segment offsets from segment_offsets()
+    - window: seconds when by_time=True, otherwise number of pings
+    - ddof: delta degrees of freedom for std; 0 gives the population std
+
+    Returns:
+    - Tuple of arrays (mean, std, min, max)
+    """
+    return _rolling_window(np.asarray(values, dtype=np.float64), np.asarray(times, dtype=np.float64),
+                           offsets, float(window), by_time, ddof)
+
+
+@njit(cache=True)
+def segment_gap_stats(times, offsets):
+    """Per-vessel reporting gap statistics: count of gaps, mean, std (ddof=1) and max gap (s)"""
+    n_segments = len(offsets) - 1
+    count = np.zeros(n_segments, dtype=np.int64)
+    mean = np.full(n_segments, np.nan)
+    std = np.full(n_segments, np.nan)
+    max_gap = np.full(n_segments, np.nan)
+    for s in range(n_segments):
+        m = 0.0
+        m2 = 0.0
+        largest = 0.0
+        k = 0
+        for i in range(offsets[s] + 1, offsets[s + 1]):
+            gap = times[i] - times[i - 1]
+            k += 1
+            d = gap - m
+            m += d / k
+            m2 += d * (gap - m)
+            largest = max(largest, gap)
+        if k > 0:
+            count[s] = k
+            mean[s] = m
+            if k > 1:
+                std[s] = np.sqrt(m2 / (k - 1))
+            max_gap[s] = largest
+    return count, mean, std, max_gap
+
+
+def vessel_window_features(ids, times, lat, lon, speed, course,
+                           window_seconds: float = 600.0) -> Dict[str, np.ndarray]:
+    """
+    Compute the standard per-ping feature set for unsorted AIS arrays.
+
+    Parameters:
+    - ids: vessel ids (MMSI)
+    - times: epoch seconds (or datetime64, converted to seconds)
+    - lat, lon, speed, course: float arrays in the same order as ids
+    - window_seconds: trailing time window for the rolling statistics
+
+    Returns:
+    - dict of arrays aligned with the *input* order: sog_diff, time_diff, distance,
+      turn_rate, acceleration, speed_mean/std/min/max, course_mean/std, gap_mean/std/max
+    """
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype("datetime64[ns]").astype(np.int64) / 1e9
+    times = times.astype(np.float64)
+
+    order = sort_by_vessel(ids, times)
+    offsets = segment_offsets(np.asarray(ids)[order])
+    t = times[order]
+    sp = np.asarray(speed, dtype=np.float64)[order]
+    co = np.asarray(course, dtype=np.float64)[order]
+
+    sog_diff, time_diff, distance = track_deltas(
+        np.asarray(lat, dtype=np.float64)[order], np.asarray(lon, dtype=np.float64)[order], sp, t, offsets
+    )
+    speed_mean, speed_std, speed_min, speed_max = _rolling_window(sp, t, offsets, window_seconds, True)
+    course_mean, course_std = rolling_circular(co, t, offsets, window_seconds, True)
+    gap_mean, gap_std, _, gap_max = _rolling_window(time_diff, t, offsets, window_seconds, True)
+
+    features = {
+        "sog_diff": sog_diff,
+        "time_diff": time_diff,
+        "distance": distance,
+        "turn_rate": turn_rate(co, t, offsets),
+        "acceleration": acceleration(sp, t, offsets),
+        "speed_mean": speed_mean,
+        "speed_std": speed_std,
+        "speed_min": speed_min,
+        "speed_max": speed_max,
+        "course_mean": course_mean,
+        "course_std": course_std,
+        "gap_mean": gap_mean,
+        "gap_std": gap_std,
+        "gap_max": gap_max,
+    }
+
+    # Scatter back to the caller's row order
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return {name: values[inverse] for name, values in features.items()}
+
+
+def add_window_features(df: pd.DataFrame, id_col: str = "MMSI", time_col: str = "BaseDateTime",
+                        lat_col: str = "LAT", lon_col: str = "LON", speed_col: str = "SOG",
+                        course_col: str = "COG", window_seconds: float = 600.0) -> pd.DataFrame:
+    """
+    Attach vessel_window_features() as new columns; suitable for dask map_partitions
+    as long as each vessel lives in a single partition.
+    """
+    times = pd.to_datetime(df[time_col]).to_numpy(dtype="datetime64[ns]")
+    features = vessel_window_features(
+        df[id_col].to_numpy(), times,
+        df[lat_col].to_numpy(dtype=np.float64), df[lon_col].to_numpy(dtype=np.float64),
+        df[speed_col].to_numpy(dtype=np.float64), df[course_col].to_numpy(dtype=np.float64),
+        window_seconds=window_seconds
+    )
+    return df.assign(**features)
@@ -0,0 +1,244 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from model.model_utils.ais_fields import resolve_columns, to_epoch_seconds
+
+EARTH_RADIUS_KM = 6371.0088
+KNOTS_TO_KMH = 1.852
+
+# Default forecast horizons in minutes
+DEFAULT_HORIZONS = (5, 10, 15, 30, 45, 60)
+
+
+def destination_point(lat: np.ndarray, lon: np.ndarray, bearing: np.ndarray,
+                      distance_km: np.ndarray):
+    """Great-circle destination from start points, bearings (deg) and distances (km), vectorized"""
+    phi1 = np.radians(lat)
+    lam1 = np.radians(lon)
+    theta = np.radians(bearing)
+    delta = distance_km / EARTH_RADIUS_KM
+
+    sin_phi2 = np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1.0, 1.0))
+    lam2 = lam1 + np.arctan2(
+        np.sin(theta) * np.sin(delta) * np.cos(phi1),
+        np.cos(delta) - np.sin(phi1) * sin_phi2
+    )
+    return np.degrees(phi2), (np.degrees(lam2) + 540.0) % 360.0 - 180.0
+
+
+def latest_track_state(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce a ping-level AIS frame to the latest kinematic state per vessel.
+
+    The turn rate (deg/min, signed, positive = starboard) is taken from the last two
+    pings of each vessel; vessels with a single ping get a turn rate of 0.
+
+    Returns:
+    - DataFrame with columns vessel_id, timestamp, latitude, longitude, speed, course, turn_rate
+    """
+    cols = resolve_columns(df)
+    required = ["vessel_id", "latitude", "longitude", "sog", "cog"]
+    missing = [field for field in required if cols[field] is None]
+    if missing:
+        raise ValueError(f"Missing columns for trajectory forecast: {missing}")
+
+    track = pd.DataFrame({
+        "vessel_id": df[cols["vessel_id"]].astype(str).to_numpy(),
+        "timestamp": (to_epoch_seconds(df[cols["timestamp"]].to_numpy())
+                      if cols["timestamp"] is not None else np.arange(len(df), dtype=float)),
+        "latitude": pd.to_numeric(df[cols["latitude"]], errors="coerce").to_numpy(),
+        "longitude": pd.to_numeric(df[cols["longitude"]], errors="coerce").to_numpy(),
+        "speed": pd.to_numeric(df[cols["sog"]], errors="coerce").to_numpy(),
+        "course": pd.to_numeric(df[cols["cog"]], errors="coerce").to_numpy(),
+    }).dropna(subset=["latitude", "longitude", "speed", "course"])
+    track = track.sort_values(["vessel_id", "timestamp"], kind="stable")
+
+    # Last two pings per vessel, without a groupby-apply
+    is_last = track["vessel_id"].ne(track["vessel_id"].shift(-1)).to_numpy()
+    has_prev = track["vessel_id"].eq(track["vessel_id"].shift(1)).to_numpy()
+    prev_course = track["course"].shift(1).to_numpy()
+    prev_ts = track["timestamp"].shift(1).to_numpy()
+
+    latest = track[is_last].copy()
+    prev_ok = has_prev[is_last]
+    minutes = (latest["timestamp"].to_numpy() - prev_ts[is_last]) / 60.0
+    dcourse = (latest["course"].to_numpy() - prev_course[is_last] + 180.0) % 360.0 - 180.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        turn_rate = np.where(prev_ok & (minutes > 0), dcourse / minutes, 0.0)
+    latest["turn_rate"] = np.nan_to_num(turn_rate)
+    return latest.reset_index(drop=True)
+
+
+class TrajectoryForecaster:
+    """
+    Short-horizon kinematic forecaster for many vessels at once.
+
+    Vessels turning faster than `turn_threshold` deg/min follow a constant-turn-rate
+    path (integrated on the sphere in `step_minutes` sub-steps); the rest follow a
+    constant-velocity great circle. Uncertainty radii grow with horizon from the
+    assumed speed and course errors.
+    """
+
+    def __init__(self, turn_threshold: float = 0.5, max_turn_rate: float = 30.0,
+                 step_minutes: float = 1.0, base_error_km: float = 0.05,
+                 speed_error_knots: float = 1.0, course_error_deg: float = 5.0,
+                 turn_error_deg_per_min: float = 0.2):
+        self.turn_threshold = turn_threshold
+        self.max_turn_rate = max_turn_rate
+        self.step_minutes = step_minutes
+        self.base_error_km = base_error_km
+        self.speed_error_knots = speed_error_knots
+        self.course_error_deg = course_error_deg
+        self.turn_error_deg_per_min = turn_error_deg_per_min
+
+    def forecast_arrays(self, lat, lon, speed, course, turn_rate=None,
+                        horizons: Sequence[float] = DEFAULT_HORIZONS) -> Dict[str, np.ndarray]:
+        """
+        Forecast positions for N vessels at H horizons.
+
+        Parameters:
+        - lat, lon: Current positions (degrees), shape (N,)
+        - speed: Speed over ground in knots, shape (N,)
+        - course: Course over ground in degrees, shape (N,)
+        - turn_rate: Signed turn rate in deg/min, shape (N,) (default 0)
+        - horizons: Forecast horizons in minutes
+
+        Returns:
+        - dict of arrays with shape (N, H): latitude, longitude, radius_km;
+          plus 'constant_turn' (N,) bool and 'horizons' (H,)
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        speed = np.asarray(speed, dtype=float)
+        course = np.asarray(course, dtype=float)
+        turn_rate = np.zeros_like(lat) if turn_rate is None else np.asarray(turn_rate, dtype=float)
+        turn_rate = np.clip(turn_rate, -self.max_turn_rate, self.max_turn_rate)
+        horizons = np.asarray(horizons, dtype=float)
+
+        speed_km_min = speed * KNOTS_TO_KMH / 60.0
+        distance = speed_km_min[:, None] * horizons[None, :]
+
+        # Constant velocity: one great-circle jump per horizon
+        out_lat, out_lon = destination_point(lat[:, None], lon[:, None], course[:, None], distance)
+
+        # Constant turn rate: integrate only the turning vessels up to the last horizon
+        turning = np.abs(turn_rate) >= self.turn_threshold
+        if turning.any() and len(horizons):
+            t_lat, t_lon = lat[turning], lon[turning]
+            t_course, t_rate, t_step = course[turning], turn_rate[turning], speed_km_min[turning]
+            n_steps = int(np.ceil(horizons.max() / self.step_minutes))
+            times = np.arange(1, n_steps + 1) * self.step_minutes
+            path_lat = np.empty((len(t_lat), n_steps))
+            path_lon = np.empty((len(t_lat), n_steps))
+            for k in range(n_steps):
+                # Mid-step heading keeps the arc symmetric
+                heading = t_course + t_rate * (k + 0.5) * self.step_minutes
+                t_lat, t_lon = destination_point(t_lat, t_lon, heading, t_step * self.step_minutes)
+                path_lat[:, k], path_lon[:, k] = t_lat, t_lon
+            idx = np.clip(np.searchsorted(times, horizons - 1e-9), 0, n_steps - 1)
+            out_lat[turning] = path_lat[:, idx]
+            out_lon[turning] = path_lon[:, idx]
+
+        # Along-track (speed) and cross-track (course/turn) errors added in quadrature
+        hours = horizons[None, :] / 60.0
+        along = self.speed_error_knots * KNOTS_TO_KMH * hours
+        heading_error = np.radians(self.course_error_deg + self.turn_error_deg_per_min * horizons[None, :] / 2.0)
+        cross = distance * np.sin(np.minimum(heading_error, np.pi / 2))
+        radius = self.base_error_km + np.sqrt(along ** 2 + cross ** 2)
+
+        return {
+            "horizons": horizons,
+            "latitude": out_lat,
+            "longitude": out_lon,
+            "radius_km": radius,
+            "constant_turn": turning,
+        }
+
+    def forecast_frame(self, state: pd.DataFrame,
+                       horizons: Sequence[float] = DEFAULT_HORIZONS) -> pd.DataFrame:
+        """
+        Forecast every vessel in a latest-state frame (see latest_track_state).
+
+        Returns:
+        - Long-format DataFrame: vessel_id, horizon_min, latitude, longitude, radius_km, model
+        """
+        result = self.forecast_arrays(
+            state["latitude"].to_numpy(), state["longitude"].to_numpy(),
+            state["speed"].to_numpy(), state["course"].to_numpy(),
+            state["turn_rate"].to_numpy() if "turn_rate" in state.columns else None,
+            horizons=horizons
+        )
+        n, h = result["latitude"].shape
+        return pd.DataFrame({
+            "vessel_id": np.repeat(state["vessel_id"].to_numpy(), h),
+            "horizon_min": np.tile(result["horizons"], n),
+            "latitude": result["latitude"].ravel(),
+            "longitude": result["longitude"].ravel(),
+            "radius_km": result["radius_km"].ravel(),
+            "model": np.repeat(np.where(result["constant_turn"], "constant_turn", "constant_velocity"), h),
+        })
+
+    def forecast_single(self, latitude: float, longitude: float, speed: float, course: float,
+                        turn_rate: float = 0.0,
+                        horizons: Sequence[float] = DEFAULT_HORIZONS) -> List[Dict[str, Any]]:
+        """Forecast one vessel and return a list of forecast points for JSON responses"""
+        result = self.forecast_arrays([latitude], [longitude], [speed], [course], [turn_rate],
+                                      horizons=horizons)
+        return [
+            {
+                "horizon_min": float(result["horizons"][j]),
+                "latitude": float(result["latitude"][0, j]),
+                "longitude": float(result["longitude"][0, j]),
+                "radius_km": float(result["radius_km"][0, j]),
+            }
+            for j in range(len(result["horizons"]))
+        ]
+
+    def predict_zone_entries(self, state: pd.DataFrame, horizons: Sequence[float] = DEFAULT_HORIZONS,
+                             zone_types: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Find vessels whose forecast path enters a zone they are not in now.
+
+        All current positions and forecast points are tested against the zone
+        index in a single vectorized call per zone type.
+
+        Returns:
+        - DataFrame with one row per (vessel, zone type) entry: vessel_id, zone_type,
+          minutes_to_entry, latitude, longitude (forecast point of first entry)
+        """
+        from geospatial.geofencing.fence_utils import points_in_zones
+
+        result = self.forecast_arrays(
+            state["latitude"].to_numpy(), state["longitude"].to_numpy(),
+            state["speed"].to_numpy(), state["course"].to_numpy(),
+            state["turn_rate"].to_numpy() if "turn_rate" in state.columns else None,
+            horizons=horizons
+        )
+        # Column 0 is the current position, the rest are the forecast points
+        lats = np.column_stack([state["latitude"].to_numpy(), result["latitude"]])
+        lons = np.column_stack([state["longitude"].to_numpy(), result["longitude"]])
+        inside = points_in_zones(lons, lats, zone_types)
+
+        entries = []
+        vessel_ids = state["vessel_id"].to_numpy()
+        for zone_type, mask in inside.items():
+            future = mask[:, 1:] & ~mask[:, [0]]
+            hit = future.any(axis=1)
+            if not hit.any():
+                continue
+            first = future.argmax(axis=1)[hit]
+            rows = np.flatnonzero(hit)
+            entries.append(pd.DataFrame({
+                "vessel_id": vessel_ids[rows],
+                "zone_type": zone_type,
+                "minutes_to_entry": result["horizons"][first],
+                "latitude": result["latitude"][rows, first],
+                "longitude": result["longitude"][rows, first],
+            }))
+
+        if not entries:
+            return pd.DataFrame(columns=["vessel_id", "zone_type", "minutes_to_entry", "latitude", "longitude"])
+        return pd.concat(entries, ignore_index=True).sort_values("minutes_to_entry", kind="stable")
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from model.time_series.feature_kernels import rolling_stats, segment_gap_stats, segment_offsets, sort_by_vessel
+
+
+def sorted_track(values, n_vessels=3, seed=0):
+    """Pings of a few vessels at irregular times, sorted by vessel and time"""
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    ids = rng.integers(0, n_vessels, n)
+    times = rng.integers(0, 6 * 3600, n).astype(float)
+    order = sort_by_vessel(ids, times)
+    return ids[order], times[order], np.asarray(values, dtype=float)[order]
+
+
+def pandas_rolling(ids, times, values, window="600s"):
+    frame = pd.DataFrame({"id": ids, "t": pd.to_datetime(times, unit="s"), "v": values}).set_index("t")
+    rolling = frame.groupby("id")["v"].rolling(window)
+    return [agg().to_numpy() for agg in (rolling.mean, rolling.std, rolling.min, rolling.max)]
+
+
+def test_rolling_stats_match_pandas():
+    rng = np.random.default_rng(1)
+    ids, times, values = sorted_track(rng.normal(10, 3, 2000))
+    ours = rolling_stats(values, times, segment_offsets(ids), 600)
+    for got, expected in zip(ours, pandas_rolling(ids, times, values)):
+        assert np.allclose(got, expected, equal_nan=True)
+
+
+def test_constant_series_has_zero_std():
+    ids, times, values = sorted_track(np.full(500, 7.3))
+    _, std, _, _ = rolling_stats(values, times, segment_offsets(ids), 600)
+    assert np.all(std[~np.isnan(std)] == 0.0)
+
+    _, _, gap_std, _ = segment_gap_stats(np.arange(50) * 30.0, np.array([0, 50]))
+    assert gap_std[0] == 0.0
+
+
+def test_large_values_keep_precision():
+    rng = np.random.default_rng(2)
+    ids, times, values = sorted_track(1e6 + rng.normal(0, 1, 2000))
+    _, std, _, _ = rolling_stats(values, times, segment_offsets(ids), 600)
+    _, expected, _, _ = pandas_rolling(ids, times, values)
+    assert np.nanmax(np.abs(std - expected)) < 1e-6
+
+
+if __name__ == "__main__":
+    test_rolling_stats_match_pandas()
+    test_constant_series_has_zero_std()
+    test_large_values_keep_precision()
+    print("ok")
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from model.anomaly_detection.online_scorer import OnlineAnomalyScorer
+from model.model_utils.ais_fields import to_epoch_seconds
+
+START = pd.Timestamp("2024-01-01")
+
+
+def regular_track(n_pings, speed=10.0, step_s=180, vessel_id="A"):
+    """One vessel reporting a steady speed and course at a fixed cadence"""
+    return pd.DataFrame({
+        "vessel_id": vessel_id,
+        "timestamp": START + pd.to_timedelta(np.arange(n_pings) * step_s, unit="s"),
+        "speed": speed,
+        "course": 90.0,
+    })
+
+
+def test_numeric_timestamps_are_epoch_seconds():
+    seconds = to_epoch_seconds(np.array([1.7e9, 60.0]))
+    assert np.allclose(seconds, [1.7e9, 60.0])
+    assert to_epoch_seconds(np.array(["1970-01-01T00:01:00"], dtype=object))[0] == 60.0
+
+
+def test_score_frame_matches_score_ping():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "vessel_id": rng.integers(0, 5, 500).astype(str),
+        "timestamp": START + pd.to_timedelta(rng.integers(0, 86400, 500), unit="s"),
+        "speed": np.where(rng.random(500) < 0.02, 40.0, rng.normal(10, 1, 500)),
+        "course": rng.uniform(0, 360, 500),
+    }).sort_values("timestamp", kind="stable")
+
+    batch = OnlineAnomalyScorer().score_frame(df)
+    live = OnlineAnomalyScorer()
+    streamed = [live.score_ping(r.vessel_id, r.timestamp, r.speed, r.course) for r in df.itertuples()]
+    assert np.allclose(batch.to_numpy(), streamed)
+
+
+def test_repeated_ping_is_absorbed_once():
+    scorer = OnlineAnomalyScorer()
+    for _ in range(15):
+        scorer.score_ping("A", START, speed=10.0)
+    assert scorer.count[0, 0] == 1
+    assert scorer.score_ping("A", START + pd.Timedelta(minutes=3), speed=10.5) == 0.0
+
+
+def test_regular_baselines_tolerate_small_blips():
+    moored = OnlineAnomalyScorer()
+    moored.score_frame(regular_track(30, speed=0.0))
+    assert moored.score_ping("A", START + pd.Timedelta(minutes=90), speed=0.1, course=90.0) == 0.0
+
+    jitter = OnlineAnomalyScorer()
+    jitter.score_frame(regular_track(30))
+    assert jitter.score_ping("A", START + pd.Timedelta(seconds=30 * 180 + 5), speed=10.0, course=90.0) == 0.0
+
+    # A real speed jump still stands out
+    assert jitter.score_ping("A", START + pd.Timedelta(seconds=31 * 180), speed=30.0, course=90.0) > 0.7
+
+
+if __name__ == "__main__":
+    test_numeric_timestamps_are_epoch_seconds()
+    test_score_frame_matches_score_ping()
+    test_repeated_ping_is_absorbed_once()
+    test_regular_baselines_tolerate_small_blips()
+    print("ok")
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from geospatial.ingest_reduction.reduce_ais import EARTH_RADIUS_M, reduce_ais
+
+
+def slow_track(n_pings, step_m, step_s, start=pd.Timestamp("2024-01-01")):
+    """One vessel heading due north at a constant rate"""
+    lat = 10.0 + np.degrees(np.arange(n_pings) * step_m / EARTH_RADIUS_M)
+    return pd.DataFrame({
+        "vessel_id": "SLOW001",
+        "timestamp": start + pd.to_timedelta(np.arange(n_pings) * step_s, unit="s"),
+        "latitude": lat,
+        "longitude": 20.0,
+        "speed": step_m / step_s * 1.94384,
+    })
+
+
+def test_slow_vessel_high_rate():
+    # 8.9 m every 2 s for 10 minutes: every hop is a "near duplicate" of the one before
+    df = slow_track(301, step_m=8.9, step_s=2)
+    reduced, stats = reduce_ais(df)
+
+    # Near duplicates are measured from the last kept ping, so about every other ping survives
+    assert stats["after_dedup"] >= 150
+    assert reduced["latitude"].iloc[0] == df["latitude"].iloc[0]
+    assert reduced["latitude"].iloc[-1] == df["latitude"].iloc[-1]
+    assert reduced["timestamp"].iloc[-1] == df["timestamp"].iloc[-1]
+
+
+def test_numeric_epoch_seconds():
+    # A ping a minute for 100 minutes, with times as plain epoch seconds
+    df = slow_track(100, step_m=5.0, step_s=60)
+    df["timestamp"] = (df["timestamp"] - pd.Timestamp(0)).dt.total_seconds()
+    _, stats = reduce_ais(df)
+
+    assert stats["after_dedup"] == 100
+
+
+if __name__ == "__main__":
+    test_slow_vessel_high_rate()
+    test_numeric_epoch_seconds()
+    print("ok")
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "FastAPI_Backend"))
+
+from risk_engine import RiskEngine, flatten_analysis, fleet_results_frame
+
+
+def test_fleet_frame_has_violation_columns():
+    flags = pd.DataFrame({
+        "anomaly_score": [0.0, 0.0, 0.9],
+        "in_mpa": [False, True, False],
+        "in_eez": [False, True, False],
+        "near_port": [False, False, True],
+        "illegal_fishing": [False, True, False],
+    })
+    results = fleet_results_frame(flags)
+    assert results["is_violation"].tolist() == [False, True, True]
+    assert results["violation_count"].tolist() == [0, 1, 0]
+
+    scored = RiskEngine.from_file().score_frame(results)
+    assert np.allclose(scored["risk_score"], [0.0, 0.4, 0.66])
+
+
+def test_single_vessel_matches_fleet_row():
+    violations = pd.DataFrame([{"in_mpa": True, "in_eez": True, "near_port": False, "illegal_fishing": True}])
+    analysis = {
+        "predictions": {"anomaly_score": 0.5},
+        "zone_check": {"is_violation": True},
+        "violations": violations.to_dict(orient="records"),
+    }
+    row = flatten_analysis(analysis)
+    assert row["violation_count"].iloc[0] == 1
+    assert flatten_analysis(analysis, violations).equals(row)
+
+
+def test_thresholds_come_from_config():
+    engine = RiskEngine({"thresholds": {"anomaly_score": 0.5, "high_risk_score": 0.9}})
+    assert engine.anomaly_threshold == 0.5
+    assert engine.high_risk_threshold == 0.9
+    assert RiskEngine({}).high_risk_threshold == 0.7
+
+
+if __name__ == "__main__":
+    test_fleet_frame_has_violation_columns()
+    test_single_vessel_matches_fleet_row()
+    test_thresholds_come_from_config()
+    print("ok")
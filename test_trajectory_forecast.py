@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from model.anomaly_detection.online_scorer import OnlineAnomalyScorer
+from model.time_series.trajectory_forecast import TrajectoryForecaster, latest_track_state
+
+START = pd.Timestamp("2024-01-01")
+
+
+def test_latest_track_state_turn_rate():
+    df = pd.DataFrame({
+        "vessel_id": ["A", "A", "B"],
+        "timestamp": [START, START + pd.Timedelta(minutes=2), START],
+        "latitude": [10.0, 10.01, 11.0],
+        "longitude": [80.0, 80.0, 81.0],
+        "speed": [10.0, 10.0, 5.0],
+        "course": [350.0, 10.0, 90.0],
+    })
+    state = latest_track_state(df).set_index("vessel_id")
+    assert np.isclose(state.loc["A", "turn_rate"], 10.0)
+    assert state.loc["B", "turn_rate"] == 0.0
+
+
+def test_live_turn_rate_bends_the_forecast():
+    scorer = OnlineAnomalyScorer()
+    assert scorer.turn_rate("A", START, course=90.0) == 0.0
+    scorer.score_ping("A", START, speed=10.0, course=90.0)
+
+    later = START + pd.Timedelta(minutes=2)
+    assert np.isclose(scorer.turn_rate("A", later, course=80.0), -5.0)
+    scorer.score_ping("A", later, speed=10.0, course=80.0)
+    # Asking again for the ping just absorbed gives the same rate
+    assert np.isclose(scorer.turn_rate("A", later, course=80.0), -5.0)
+
+    forecaster = TrajectoryForecaster()
+    straight = forecaster.forecast_single(10.0, 80.0, 10.0, 80.0, horizons=(10,))
+    turning = forecaster.forecast_single(10.0, 80.0, 10.0, 80.0, scorer.turn_rate("A", later, 80.0), horizons=(10,))
+    # Turning to port off an easterly course ends up north of the straight-line track
+    assert turning[0]["latitude"] > straight[0]["latitude"]
+
+
+if __name__ == "__main__":
+    test_latest_track_state_turn_rate()
+    test_live_turn_rate_bends_the_forecast()
+    print("ok")